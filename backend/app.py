@@ -1,11 +1,18 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from startup_timing import startup_timer
+
+with startup_timer.timed('import flask'):
+    from flask import Flask, request, jsonify
+    from flask_cors import CORS
 import os
-import pandas as pd
-import numpy as np
-from youtube_api.youtube_client import YouTubeClient
-from youtube_api.url_parser import extract_video_id, extract_channel_info
-from sentiment_analysis.model_loader import sentiment_analyzer
+import gc
+import threading
+with startup_timer.timed('import youtube_api'):
+    from youtube_api.youtube_client import get_youtube_client, youtube_client_stats
+    from youtube_api.url_parser import extract_video_id, extract_channel_info
+    from youtube_api.rate_limit import rate_limiter, RateLimitError, estimate_channel_cost
+    from youtube_api.resilience import resilience, UpstreamUnavailable
+with startup_timer.timed('import sentiment_analysis.model_loader'):
+    from sentiment_analysis.model_loader import sentiment_analyzer
 import logging
 
 # Configure logging
@@ -16,25 +23,89 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend integration
 
-# Create necessary directories
 MODELS_DIR = os.path.join('sentiment_analysis', 'models')
-os.makedirs(MODELS_DIR, exist_ok=True)
 
-# Load sentiment model
-model_loaded = sentiment_analyzer.load_model(MODELS_DIR)
-if model_loaded:
-    logger.info("Sentiment analysis model loaded successfully")
-else:
-    logger.warning("Sentiment analysis model not loaded, will attempt to load on first analysis")
+def init_sentiment_model(background=False):
+    """
+    Create the models directory and load the sentiment model.
+    
+    With background=True the model loads on a daemon thread so routes that
+    do not need it (/api/status, /api/trending) are served immediately.
+    """
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    
+    def load():
+        with startup_timer.timed('load sentiment model'):
+            model_loaded = sentiment_analyzer.load_model(MODELS_DIR)
+        if model_loaded:
+            logger.info("Sentiment analysis model loaded successfully")
+        else:
+            logger.warning("Sentiment analysis model not loaded, will attempt to load on first analysis")
+        return model_loaded
+    
+    if background:
+        threading.Thread(target=load, name='model-loader', daemon=True).start()
+        return None
+    return load()
+
+def create_app(preload_model=False):
+    """
+    App factory used by gunicorn.conf.py.
+    
+    With preload_model=True the model is loaded synchronously and without
+    warm-up. Under gunicorn's preload_app this happens once in the master, so
+    forked workers share the memory-mapped weights copy-on-write instead of
+    each loading their own copy. Workers warm up after the fork.
+    
+    Otherwise the model loads on a background thread without blocking
+    startup (set SENTIMENT_PRELOAD=false to load on first analysis).
+    Importing this module loads nothing; the model is only loaded here.
+    """
+    if preload_model:
+        os.makedirs(MODELS_DIR, exist_ok=True)
+        with startup_timer.timed('load sentiment model'):
+            sentiment_analyzer.load_model(MODELS_DIR, warmup=False)
+        # Objects created so far are never collected; keep the GC from writing to (and copying) their pages
+        gc.freeze()
+    elif os.environ.get('SENTIMENT_PRELOAD', 'true').lower() == 'true':
+        init_sentiment_model(background=True)
+    return app
+
+def upstream_unavailable(e, route):
+    """503 response for a YouTube API outage, with Retry-After when known."""
+    logger.warning(f"YouTube API unavailable in {route}: {str(e)}")
+    response = jsonify({'error': str(e)})
+    if e.retry_after is not None:
+        response.headers['Retry-After'] = str(int(e.retry_after + 0.999))
+    return response, 503
 
 @app.route('/api/status', methods=['GET'])
 def status():
     return jsonify({
         'status': 'online',
         'model_loaded': sentiment_analyzer.model_loaded,
-        'model_type': 'Advanced BERT' if sentiment_analyzer.model_loaded else 'Not loaded'
+        'model_type': 'Advanced BERT' if sentiment_analyzer.model_loaded else 'Not loaded',
+        'inference': sentiment_analyzer.get_stats(),
+        'youtube_client': youtube_client_stats(),
+        'youtube_quota': rate_limiter.stats(),
+        'youtube_resilience': resilience.stats()
     })
 
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 only once the model is loaded and warmed up."""
+    body = {
+        'ready': sentiment_analyzer.is_ready(),
+        'state': sentiment_analyzer.state,
+        'error': sentiment_analyzer.load_error
+    }
+    return jsonify(body), 200 if body['ready'] else 503
+
+@app.route('/api/startup', methods=['GET'])
+def startup_report():
+    """Report how long each import and initialization step took in this worker."""
+    return jsonify(startup_timer.report())
+
 @app.route('/api/trending', methods=['GET'])
 def get_trending():
     """
@@ -44,7 +115,7 @@ def get_trending():
     max_results = int(request.args.get('maxResults', 10))
     
     try:
-        client = YouTubeClient()
+        client = get_youtube_client()
         trending_videos = client.get_trending_videos(region_code=region_code, max_results=max_results)
         
         if not trending_videos:
@@ -57,6 +128,11 @@ def get_trending():
             'trending_videos': trending_videos
         })
     
+    except UpstreamUnavailable as e:
+        return upstream_unavailable(e, '/api/trending')
+    except RateLimitError as e:
+        logger.warning(f"Rate limited in /api/trending: {str(e)}")
+        return jsonify({'error': str(e), 'remainingQuota': rate_limiter.remaining_quota()}), 429
     except Exception as e:
         logger.error(f"Error in /api/trending: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -76,8 +152,8 @@ def analyze_video():
             
         logger.info(f"Analyzing video: {video_id}")
         
-        # Initialize YouTube client
-        client = YouTubeClient()
+        # Shared YouTube client (built once per process)
+        client = get_youtube_client()
         
         # Get comments for the video
         response = client.get_video_comments(video_id)
@@ -100,6 +176,11 @@ def analyze_video():
             'results': results
         })
             
+    except UpstreamUnavailable as e:
+        return upstream_unavailable(e, 'analyze_video')
+    except RateLimitError as e:
+        logger.warning(f"Rate limited in analyze_video: {str(e)}")
+        return jsonify({'error': str(e), 'remainingQuota': rate_limiter.remaining_quota()}), 429
     except Exception as e:
         logger.error(f"Error in analyze_video: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -116,8 +197,8 @@ def analyze_channel():
         return jsonify({'error': 'No channel ID or username provided'}), 400
     
     try:
-        # Initialize YouTube client
-        client = YouTubeClient()
+        # Shared YouTube client (built once per process)
+        client = get_youtube_client()
         
         channel_id = data.get('channelId')
         username = data.get('username')
@@ -131,6 +212,11 @@ def analyze_channel():
                 username = channel_value
                 channel_id = None
         
+        # Check the quota for the whole analysis up front
+        max_results = int(data.get('maxResults', 10))
+        resolve_username = bool(username and not channel_id)
+        rate_limiter.ensure_quota(estimate_channel_cost(max_results, resolve_username=resolve_username))
+        
         # If we have a username but no channel ID, fetch the channel ID
         if username and not channel_id:
             channel_id = client.get_channel_id_from_username(username)
@@ -145,7 +231,6 @@ def analyze_channel():
             return jsonify({'error': f"Could not retrieve channel information for ID: {channel_id}"}), 404
         
         # Get videos from the channel
-        max_results = int(data.get('maxResults', 10))
         videos = client.get_channel_videos(channel_id, max_results=max_results)
         if not videos:
             return jsonify({
@@ -157,14 +242,15 @@ def analyze_channel():
         video_limit = min(max_results, len(videos))
         video_ids = [v['videoId'] for v in videos[:video_limit]]
         
-        comments_data = []
+        analysis_by_video = {}
         total_comments = 0
         total_sentiment = {'positive': 0, 'negative': 0, 'neutral': 0}
         
-        for vid in video_ids:
-            video_comments = client.get_video_comments(vid, max_results=50)
-            if video_comments and video_comments[0]['comments']:
-                comments = [c['comment'] for c in video_comments[0]['comments']]
+        # Comments are fetched for several videos in parallel; each video is
+        # classified as soon as its comments arrive
+        for vid, video_comments in client.iter_video_comments(video_ids, max_results=50):
+            if video_comments['comments']:
+                comments = [c['comment'] for c in video_comments['comments']]
                 results, sentiment_counts = sentiment_analyzer.analyze_comments(comments)
                 
                 # Aggregate
@@ -176,7 +262,7 @@ def analyze_channel():
                 vid_info = next((x for x in videos if x['videoId'] == vid), None)
                 title = vid_info['title'] if vid_info else "Unknown"
                 
-                comments_data.append({
+                analysis_by_video[vid] = {
                     'videoId': vid,
                     'title': title,
                     'commentCount': len(comments),
@@ -185,7 +271,10 @@ def analyze_channel():
                         s: round((c / len(comments)) * 100, 1) if len(comments) else 0 
                         for s, c in sentiment_counts.items()
                     }
-                })
+                }
+        
+        # Report videos in channel order regardless of which finished first
+        comments_data = [analysis_by_video[vid] for vid in video_ids if vid in analysis_by_video]
         
         # Calculate overall sentiment percentages
         overall_percentages = {
@@ -204,6 +293,11 @@ def analyze_channel():
             'videoAnalysis': comments_data
         })
             
+    except UpstreamUnavailable as e:
+        return upstream_unavailable(e, 'analyze_channel')
+    except RateLimitError as e:
+        logger.warning(f"Rate limited in analyze_channel: {str(e)}")
+        return jsonify({'error': str(e), 'remainingQuota': rate_limiter.remaining_quota()}), 429
     except Exception as e:
         logger.error(f"Error in analyze_channel: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -211,6 +305,8 @@ def analyze_channel():
 def use_sample_trending_data():
     """Use sample trending data when real data is not available."""
     try:
+        import pandas as pd
+        
         sample_path = os.path.join('scraper', 'output', 'sample_trending.csv')
         
         if not os.path.exists(sample_path):
@@ -292,26 +388,56 @@ def run_scraper():
                 'message': 'Scraper ran but no data was obtained.'
             }), 500
         
+    except UpstreamUnavailable as e:
+        return upstream_unavailable(e, 'run_scraper')
     except Exception as e:
         logger.error(f"Error running scraper: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/train-model', methods=['POST'])
 def train_model():
-    """API endpoint to train the sentiment analysis model on demand."""
+    """
+    API endpoint to train the sentiment analysis model on demand.
+    
+    Optional JSON body {"mode": "full" | "distill" | "probe"}: "distill" trains
+    a small student from the current model instead of fine-tuning BERT again;
+    "probe" trains only a classifier head on cached frozen BERT embeddings,
+    which takes seconds once the cache is warm. With "probe", newly labeled
+    comments can be added as "examples": [{"text": ..., "label": "positive"}].
+    """
     try:
-        from sentiment_analysis.advanced_model import train_model
+        data = request.get_json(silent=True) or {}
+        mode = data.get('mode', 'full')
+        kwargs = {}
+        
+        if mode == 'full':
+            from sentiment_analysis.advanced_model import train_model
+        elif mode == 'distill':
+            from sentiment_analysis.distillation import train_distilled_model as train_model
+        elif mode == 'probe':
+            from sentiment_analysis.linear_probe import train_linear_probe as train_model, LABEL_IDS
+            examples = data.get('examples') or []
+            if any(not isinstance(e, dict) or e.get('label') not in LABEL_IDS or not e.get('text') for e in examples):
+                return jsonify({'error': f"Each example needs a text and a label in {list(LABEL_IDS)}"}), 400
+            kwargs['extra_examples'] = [(e['text'], e['label']) for e in examples]
+        else:
+            return jsonify({'error': f"Unknown training mode: {mode}"}), 400
         
         # Run the training process
-        logger.info("Starting sentiment model training...")
-        model_info = train_model()
+        logger.info(f"Starting sentiment model training (mode={mode})...")
+        model_info = train_model(**kwargs)
         
-        # Reload the model
-        sentiment_analyzer.load_model()
+        # Reload the model from where train_model saved it
+        if not sentiment_analyzer.load_model('models'):
+            return jsonify({
+                'error': f"Model trained but could not be reloaded: {sentiment_analyzer.load_error}",
+                'mode': mode
+            }), 500
         
         return jsonify({
             'success': True,
             'message': 'Sentiment analysis model trained successfully',
+            'mode': mode,
             'accuracy': model_info['metrics']['eval_accuracy']
         })
         
@@ -328,4 +454,4 @@ if __name__ == '__main__':
     # Log server startup
     logger.info(f"Starting Flask server on {host}:{port} (debug={debug})")
     
-    app.run(host=host, port=port, debug=debug)
\ No newline at end of file
+    create_app().run(host=host, port=port, debug=debug)
\ No newline at end of file
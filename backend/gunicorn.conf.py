@@ -0,0 +1,26 @@
+"""
+Gunicorn configuration for the Flask API.
+The app is loaded through create_app(preload_model=True) in the master
+process before workers are forked, so all workers share one copy of the
+model weights. Set GUNICORN_PRELOAD=false to load the app in each worker.
+"""
+
+import os
+import threading
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+# Threads let concurrent requests share micro-batched forward passes
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+wsgi_app = 'app:create_app(preload_model=True)'
+# Loading BERT in the master can take longer than the default worker timeout
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+
+def post_worker_init(worker):
+    """Warm up the model in each worker after the fork, without blocking request handling."""
+    from sentiment_analysis.model_loader import sentiment_analyzer
+
+    if sentiment_analyzer.model_loaded and sentiment_analyzer.warmup_enabled:
+        threading.Thread(target=sentiment_analyzer.warm_up, name='model-warmup', daemon=True).start()
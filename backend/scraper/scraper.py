@@ -1,9 +1,17 @@
-import requests
 import sys
 import time
 import os
 import argparse
-import certifi
+from pathlib import Path
+
+# Make the backend packages importable when running this file as a script
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from youtube_api.rate_limit import RateLimitError
+from youtube_api.resilience import resilience, ApiError, UpstreamUnavailable
+from youtube_api.rest import api_get
 
 # List of simple to collect features
 snippet_features = ["comment_id", "comment_text", "author", "comment_date", "title",
@@ -47,31 +55,18 @@ def get_tags(tags_list):
 def api_request(page_token, country_code, api_key):
     # Builds the URL and requests the JSON from it
     popular_videos_url = f"https://www.googleapis.com/youtube/v3/videos?part=snippet,statistics&chart=mostPopular&regionCode={country_code}&maxResults=50&key={api_key}{page_token}"
-    response = requests.get(popular_videos_url, verify=certifi.where())
-    if response.status_code == 429:
-        print("Temp-Banned due to excess requests, please wait and continue later")
-        sys.exit(1)
-    if response.status_code != 200:
-        print(f"Error: Received status code {response.status_code}")
-        print(response.text)
-        sys.exit(1)
-    return response.json()
+    return api_get(popular_videos_url, 'videos.list').json()
 
 def api_request_comments(video_id, api_key, max_results=10):
     # Builds the URL and requests the JSON from it
     comments_url = f"https://www.googleapis.com/youtube/v3/commentThreads?part=snippet&videoId={video_id}&maxResults={max_results}&key={api_key}"
-    response = requests.get(comments_url, verify=certifi.where())
-    if response.status_code == 429:
-        print("Temp-Banned due to excess requests, please wait and continue later")
-        sys.exit(1)
-    if response.status_code == 403 and "commentsDisabled" in response.text:
-        print(f"Comments are disabled for video ID {video_id}")
-        return None
-    if response.status_code != 200:
-        print(f"Error: Received status code {response.status_code}")
-        print(response.text)
-        sys.exit(1)
-    return response.json()
+    try:
+        return api_get(comments_url, 'commentThreads.list').json()
+    except ApiError as e:
+        if e.status == 403 and "commentsDisabled" in e.body:
+            print(f"Comments are disabled for video ID {video_id}")
+            return None
+        raise
 
 def fetch_popular_videos(items):
     video_details = []
@@ -195,4 +190,9 @@ if __name__ == "__main__":
     output_dir = args.output_dir
     api_key, country_codes = setup(args.key_path, args.country_code_path)
 
-    get_data()
+    try:
+        get_data()
+    except (ApiError, UpstreamUnavailable, RateLimitError) as e:
+        print(f"Error: {e}")
+        print(f"Retries and circuit breaker: {resilience.stats()}")
+        sys.exit(1)
@@ -1,25 +1,27 @@
-import requests
 import sys
 import time
 import os
 import argparse
-import certifi
 import logging
-import importlib.util
 from pathlib import Path
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Make the backend packages importable when running this file as a script
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from youtube_api.rate_limit import (rate_limiter, RateLimitError, MAX_IDS_PER_REQUEST,
+                                    estimate_channel_cost, estimate_trending_cost)
+from youtube_api.resilience import ApiError, UpstreamUnavailable
+from youtube_api.rest import api_get
+
 # Try to import sentiment_analyzer - handle gracefully if it's not available
 try:
-    # Import the sentiment analyzer using relative import path
-    sentiment_module_path = Path(__file__).parent.parent / "sentiment_analysis" / "model_loader.py"
-    spec = importlib.util.spec_from_file_location("model_loader", sentiment_module_path)
-    model_loader = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(model_loader)
-    sentiment_analyzer = model_loader.sentiment_analyzer
+    from sentiment_analysis.model_loader import sentiment_analyzer
     has_sentiment_analyzer = True
     logger.info("Sentiment analyzer loaded successfully")
 except Exception as e:
@@ -69,35 +71,52 @@ def api_request(page_token, country_code, api_key):
     # Builds the URL and requests the JSON from it
     popular_videos_url = f"https://www.googleapis.com/youtube/v3/videos?part=snippet,statistics&chart=mostPopular&regionCode={country_code}&maxResults=50&key={api_key}{page_token}"
     try:
-        response = requests.get(popular_videos_url, verify=certifi.where())
-        if response.status_code == 429:
-            logger.error("Temp-Banned due to excess requests, please wait and continue later")
-            return None
-        if response.status_code != 200:
-            logger.error(f"Error: Received status code {response.status_code}")
-            logger.error(response.text)
-            return None
-        return response.json()
+        return api_get(popular_videos_url, 'videos.list').json()
+    except ApiError as e:
+        logger.error(f"Error: Received status code {e.status}")
+        logger.error(e.body)
+        return None
+    except (UpstreamUnavailable, RateLimitError):
+        raise
     except Exception as e:
         logger.error(f"Error in API request: {e}")
         return None
 
+def api_request_videos(video_ids, api_key, part="snippet,statistics"):
+    """
+    Return {video_id: video resource} for video_ids, with one videos.list call
+    per MAX_IDS_PER_REQUEST IDs. Videos that are not returned are left out.
+    """
+    video_ids = list(dict.fromkeys(video_ids))
+    videos = {}
+    for start in range(0, len(video_ids), MAX_IDS_PER_REQUEST):
+        ids = ','.join(video_ids[start:start + MAX_IDS_PER_REQUEST])
+        videos_url = f"https://www.googleapis.com/youtube/v3/videos?part={part}&id={ids}&key={api_key}"
+        try:
+            for item in api_get(videos_url, 'videos.list').json().get('items', []):
+                videos[item['id']] = item
+        except ApiError as e:
+            logger.error(f"Failed to get video data: Status code {e.status}")
+        except (UpstreamUnavailable, RateLimitError):
+            raise
+        except Exception as e:
+            logger.error(f"Error in videos API request: {e}")
+    return videos
+
 def api_request_comments(video_id, api_key, max_results=10):
     # Builds the URL and requests the JSON from it
     comments_url = f"https://www.googleapis.com/youtube/v3/commentThreads?part=snippet&videoId={video_id}&maxResults={max_results}&key={api_key}"
     try:
-        response = requests.get(comments_url, verify=certifi.where())
-        if response.status_code == 429:
-            logger.error("Temp-Banned due to excess requests, please wait and continue later")
-            return None
-        if response.status_code == 403 and "commentsDisabled" in response.text:
+        return api_get(comments_url, 'commentThreads.list').json()
+    except ApiError as e:
+        if e.status == 403 and "commentsDisabled" in e.body:
             logger.warning(f"Comments are disabled for video ID {video_id}")
-            return None
-        if response.status_code != 200:
-            logger.error(f"Error: Received status code {response.status_code}")
-            logger.error(response.text)
-            return None
-        return response.json()
+        else:
+            logger.error(f"Error: Received status code {e.status}")
+            logger.error(e.body)
+        return None
+    except (UpstreamUnavailable, RateLimitError):
+        raise
     except Exception as e:
         logger.error(f"Error in comments API request: {e}")
         return None
@@ -174,8 +193,6 @@ def fetch_and_process_comments(video_details, api_key):
                 break
         
         lines.extend(comment_lines)
-        # Sleep to avoid hitting API rate limits
-        time.sleep(0.5)
     
     return lines
 
@@ -265,13 +282,25 @@ def get_data(key_path='api_key.txt', country_code_path='country_codes.txt', outp
 
     results = []
     for country_code in country_codes:
+        try:
+            rate_limiter.ensure_quota(estimate_trending_cost(5))
+        except RateLimitError as e:
+            logger.error(f"Stopping before {country_code}: {e}")
+            break
         logger.info(f"Processing country code: {country_code}")
         
         # Add the CSV header
         country_data = [",".join(header)]
         
         # Get top 5 trending videos with top 5 comments each
-        pages_data = get_pages(country_code, api_key, max_videos=5, comments_per_video=5)
+        try:
+            pages_data = get_pages(country_code, api_key, max_videos=5, comments_per_video=5)
+        except UpstreamUnavailable as e:
+            # Keep what was collected so far; fail only if nothing was
+            logger.error(f"Stopping at {country_code}: {e}")
+            if not results:
+                raise
+            break
         
         if pages_data:
             country_data.extend(pages_data)
@@ -320,9 +349,11 @@ def get_data(key_path='api_key.txt', country_code_path='country_codes.txt', outp
     logger.info(f"Completed data collection for {len(results)} countries")
     return results
 
-def get_video_data(video_id, api_key=None):
+def get_video_data(video_id, api_key=None, video_item=None):
     """
-    Get detailed data for a specific video including comments
+    Get detailed data for a specific video including comments.
+    video_item is the video's videos.list resource if the caller already
+    fetched it (e.g. in a batch), which saves the lookup here.
     """
     if not api_key:
         # Try to load API key if not provided
@@ -332,16 +363,11 @@ def get_video_data(video_id, api_key=None):
             logger.error("No API key found, cannot retrieve video data")
             return None
     
-    # Get video details
-    video_url = f"https://www.googleapis.com/youtube/v3/videos?part=snippet,statistics&id={video_id}&key={api_key}"
     try:
-        response = requests.get(video_url, verify=certifi.where())
-        if response.status_code != 200:
-            logger.error(f"Failed to get video data: Status code {response.status_code}")
-            return None
-        
-        video_data = response.json()
-        if not video_data.get('items'):
+        # Get video details
+        if video_item is None:
+            video_item = api_request_videos([video_id], api_key).get(video_id)
+        if not video_item:
             logger.error(f"No video found with ID {video_id}")
             return None
         
@@ -375,15 +401,17 @@ def get_video_data(video_id, api_key=None):
         
         return {
             'id': video_id,
-            'title': video_data['items'][0]['snippet']['title'],
-            'channel': video_data['items'][0]['snippet']['channelTitle'],
-            'publishedAt': video_data['items'][0]['snippet']['publishedAt'],
-            'viewCount': video_data['items'][0]['statistics'].get('viewCount', 0),
-            'likeCount': video_data['items'][0]['statistics'].get('likeCount', 0),
-            'commentCount': video_data['items'][0]['statistics'].get('commentCount', 0),
+            'title': video_item['snippet']['title'],
+            'channel': video_item['snippet']['channelTitle'],
+            'publishedAt': video_item['snippet']['publishedAt'],
+            'viewCount': video_item['statistics'].get('viewCount', 0),
+            'likeCount': video_item['statistics'].get('likeCount', 0),
+            'commentCount': video_item['statistics'].get('commentCount', 0),
             'comments': comments,
             'sentiment': sentiment_results
         }
+    except (UpstreamUnavailable, RateLimitError):
+        raise
     except Exception as e:
         logger.error(f"Error retrieving video data: {e}")
         return None
@@ -401,32 +429,40 @@ def get_channel_data(channel_id, api_key=None, max_videos=5):
             return None
     
     try:
+        rate_limiter.ensure_quota(estimate_channel_cost(max_videos))
+        
         # Get channel details
         channel_url = f"https://www.googleapis.com/youtube/v3/channels?part=snippet,statistics&id={channel_id}&key={api_key}"
-        response = requests.get(channel_url, verify=certifi.where())
-        if response.status_code != 200:
-            logger.error(f"Failed to get channel data: Status code {response.status_code}")
+        try:
+            channel_data = api_get(channel_url, 'channels.list').json()
+        except ApiError as e:
+            logger.error(f"Failed to get channel data: Status code {e.status}")
             return None
         
-        channel_data = response.json()
         if not channel_data.get('items'):
             logger.error(f"No channel found with ID {channel_id}")
             return None
         
         # Get channel's videos
         videos_url = f"https://www.googleapis.com/youtube/v3/search?part=snippet&channelId={channel_id}&maxResults={max_videos}&order=date&type=video&key={api_key}"
-        response = requests.get(videos_url, verify=certifi.where())
-        if response.status_code != 200:
-            logger.error(f"Failed to get channel videos: Status code {response.status_code}")
+        try:
+            videos_data = api_get(videos_url, 'search.list').json()
+        except ApiError as e:
+            logger.error(f"Failed to get channel videos: Status code {e.status}")
             return None
         
-        videos_data = response.json()
         video_items = videos_data.get('items', [])
         
+        # Details and statistics for all videos in one batched lookup
+        video_ids = [item['id']['videoId'] for item in video_items]
+        video_resources = api_request_videos(video_ids, api_key)
+        
         videos = []
-        for item in video_items:
-            video_id = item['id']['videoId']
-            video_info = get_video_data(video_id, api_key)
+        for video_id in video_ids:
+            if video_id not in video_resources:
+                logger.error(f"No video found with ID {video_id}")
+                continue
+            video_info = get_video_data(video_id, api_key, video_item=video_resources[video_id])
             if video_info:
                 videos.append(video_info)
         
@@ -441,6 +477,8 @@ def get_channel_data(channel_id, api_key=None, max_videos=5):
             'viewCount': channel_data['items'][0]['statistics'].get('viewCount', 0),
             'videos': videos
         }
+    except (UpstreamUnavailable, RateLimitError):
+        raise
     except Exception as e:
         logger.error(f"Error retrieving channel data: {e}")
         return None
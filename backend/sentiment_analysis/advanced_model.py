@@ -7,68 +7,68 @@ import os
 import torch
 import numpy as np
 import pandas as pd
-import pickle
-from transformers import BertTokenizer, BertForSequenceClassification
-from transformers import TrainingArguments, Trainer
+from transformers import BertTokenizerFast, BertForSequenceClassification
+from transformers import TrainingArguments
 from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
 from torch.utils.data import Dataset
 import nltk
-from nltk.corpus import stopwords
-import re
+import copy
+import time
+import argparse
 
-# Create models directory if it doesn't exist
-os.makedirs('models', exist_ok=True)
+try:
+    from sentiment_analysis.precision import (
+        PRECISION_MODES, quantize_dynamic_int8, inference_context, save_quantized_model
+    )
+    from sentiment_analysis.inference_backends import OnnxBackend
+    from sentiment_analysis.model_manifest import load_model_info, save_model_info
+    from sentiment_analysis.training_data import TokenizedCorpus, DynamicPaddingCollator, LengthGroupedTrainer
+    from sentiment_analysis.text_preprocessing import clean_text, clean_texts
+except ImportError:
+    # Running as a script from inside sentiment_analysis/
+    from precision import PRECISION_MODES, quantize_dynamic_int8, inference_context, save_quantized_model
+    from inference_backends import OnnxBackend
+    from model_manifest import load_model_info, save_model_info
+    from training_data import TokenizedCorpus, DynamicPaddingCollator, LengthGroupedTrainer
+    from text_preprocessing import clean_text, clean_texts
 
-# Download necessary NLTK resources
-nltk.download('stopwords', quiet=True)
-nltk.download('wordnet', quiet=True)
-nltk.download('punkt', quiet=True)
+def init_resources(model_dir='models'):
+    """Create the models directory and download NLTK resources needed for training."""
+    os.makedirs(model_dir, exist_ok=True)
+    
+    nltk.download('stopwords', quiet=True)
+    nltk.download('wordnet', quiet=True)
+    nltk.download('punkt', quiet=True)
 
-# Set device
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-print(f"Using device: {device}")
+def get_device():
+    """Select the training device."""
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    print(f"Using device: {device}")
+    return device
 
 # Sample data with YouTube-like comments and their sentiment
 # This is a simplified dataset for demonstration
 class YouTubeCommentsDataset(Dataset):
-    def __init__(self, texts, labels, tokenizer, max_length=128):
-        self.texts = texts
-        self.labels = labels
-        self.tokenizer = tokenizer
+    def __init__(self, texts, labels, tokenizer, max_length=128, cache_dir=os.path.join('models', 'token_cache')):
+        self.labels = np.asarray(labels, dtype=np.int64)
         self.max_length = max_length
         
+        # Tokenized once per tokenizer/corpus into memory-mapped arrays; padding happens per batch in the collator
+        self.corpus = TokenizedCorpus.build(tokenizer, list(texts), cache_dir, max_length=max_length)
+        self.lengths = self.corpus.lengths
+        
     def __len__(self):
-        return len(self.texts)
+        return len(self.labels)
     
     def __getitem__(self, idx):
-        text = str(self.texts[idx])
-        label = self.labels[idx]
-        
-        encoding = self.tokenizer(
-            text,
-            add_special_tokens=True,
-            max_length=self.max_length,
-            return_token_type_ids=False,
-            padding='max_length',
-            truncation=True,
-            return_attention_mask=True,
-            return_tensors='pt'
-        )
-        
         return {
-            'input_ids': encoding['input_ids'].flatten(),
-            'attention_mask': encoding['attention_mask'].flatten(),
-            'labels': torch.tensor(label, dtype=torch.long)
+            'input_ids': self.corpus[idx],
+            'labels': int(self.labels[idx])
         }
 
 def preprocess_text(text):
     """Clean and preprocess text data."""
-    text = text.lower()
-    text = re.sub(r"http\S+|www\S+|https\S+", '', text, flags=re.MULTILINE)
-    text = re.sub(r'\@\w+|\#','', text)
-    text = re.sub(r'[^A-Za-z\s]+', '', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    return clean_text(text)
 
 def compute_metrics(pred):
     """Compute metrics for evaluation."""
@@ -245,21 +245,29 @@ def create_training_data():
     df = pd.DataFrame(expanded_data, columns=['comment_text', 'label'])
     
     # Clean and preprocess
-    df['processed_text'] = df['comment_text'].apply(preprocess_text)
+    df['processed_text'] = clean_texts(df['comment_text'])
     
     return df
 
+def create_train_test_split(seed=42):
+    """Create the training data and split it into train and held-out test sets."""
+    from sklearn.model_selection import train_test_split
+    
+    # Seed the comment variations so the held-out split is reproducible
+    np.random.seed(seed)
+    df = create_training_data()
+    return train_test_split(df, test_size=0.2, random_state=seed, stratify=df['label'])
+
 def train_model():
     """Train BERT model for sentiment analysis."""
-    # Create dataset
-    df = create_training_data()
+    init_resources()
+    device = get_device()
     
-    # Split data
-    from sklearn.model_selection import train_test_split
-    train_df, test_df = train_test_split(df, test_size=0.2, random_state=42, stratify=df['label'])
+    # Create dataset and split data
+    train_df, test_df = create_train_test_split()
     
     # Initialize tokenizer
-    tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
+    tokenizer = BertTokenizerFast.from_pretrained('bert-base-uncased')
     
     # Create datasets
     train_dataset = YouTubeCommentsDataset(
@@ -298,12 +306,13 @@ def train_model():
         metric_for_best_model="accuracy"
     )
     
-    # Initialize trainer
-    trainer = Trainer(
+    # Initialize trainer: batches are padded per batch and grouped by comment length
+    trainer = LengthGroupedTrainer(
         model=model,
         args=training_args,
         train_dataset=train_dataset,
         eval_dataset=test_dataset,
+        data_collator=DynamicPaddingCollator(tokenizer.pad_token_id),
         compute_metrics=compute_metrics
     )
     
@@ -320,28 +329,248 @@ def train_model():
     model_dir = 'models'
     os.makedirs(model_dir, exist_ok=True)
     
-    # Save model parts
-    model.save_pretrained(os.path.join(model_dir, 'bert_sentiment_model'))
+    # Save model parts (safetensors weights can be memory-mapped at load time)
+    model.save_pretrained(os.path.join(model_dir, 'bert_sentiment_model'), safe_serialization=True)
     tokenizer.save_pretrained(os.path.join(model_dir, 'bert_tokenizer'))
     
+    # Export an ONNX copy for the ONNX Runtime serving backend
+    onnx_path = os.path.join(model_dir, 'bert_sentiment_model.onnx')
+    export_onnx(model, tokenizer, onnx_path)
+    
     # Create a model info object for easier loading
     model_info = {
         'model_type': 'bert',
+        'version': time.strftime('%Y%m%d%H%M%S'),
         'model_path': os.path.join(model_dir, 'bert_sentiment_model'),
         'tokenizer_path': os.path.join(model_dir, 'bert_tokenizer'),
+        'onnx_path': onnx_path,
+        'backend': 'torch',
         'metrics': eval_result,
         'labels': {0: 'negative', 1: 'positive', 2: 'neutral'}
     }
+    model_info['onnx_parity'] = check_onnx_parity(model, tokenizer, onnx_path)
     
-    # Save model info
-    with open(os.path.join(model_dir, 'model_info.pkl'), 'wb') as f:
-        pickle.dump(model_info, f)
+    # Save model info as a JSON manifest
+    save_model_info(model_dir, model_info)
     
     print(f"Model saved to {model_dir}")
     return model_info
 
+def export_onnx(model, tokenizer, onnx_path, max_length=128):
+    """Export the classifier to ONNX with dynamic batch and sequence axes."""
+    model = model.to('cpu').eval()
+    sample = tokenizer(
+        ["export sample comment", "another sample"],
+        max_length=max_length,
+        padding=True,
+        truncation=True,
+        return_tensors='pt'
+    )
+    
+    torch.onnx.export(
+        model,
+        (sample['input_ids'], sample['attention_mask']),
+        onnx_path,
+        input_names=['input_ids', 'attention_mask'],
+        output_names=['logits'],
+        dynamic_axes={
+            'input_ids': {0: 'batch', 1: 'sequence'},
+            'attention_mask': {0: 'batch', 1: 'sequence'},
+            'logits': {0: 'batch'}
+        },
+        opset_version=14,
+        do_constant_folding=True
+    )
+    print(f"ONNX model exported to {onnx_path}")
+    return onnx_path
+
+def check_onnx_parity(model, tokenizer, onnx_path, batch_size=32, max_length=128):
+    """
+    Check that torch and ONNX Runtime predict the same labels on the synthetic corpus.
+    
+    Returns a summary dict, or None when onnxruntime is not installed.
+    """
+    try:
+        backend = OnnxBackend(onnx_path)
+    except ImportError:
+        print("onnxruntime is not installed, skipping ONNX parity check")
+        return None
+    
+    model = model.to('cpu').eval()
+    texts = create_training_data()['processed_text'].tolist()
+    mismatches = 0
+    max_prob_diff = 0.0
+    
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        encoding = tokenizer(batch, max_length=max_length, padding=True, truncation=True, return_tensors='np')
+        
+        with torch.no_grad():
+            torch_logits = model(
+                input_ids=torch.from_numpy(encoding['input_ids']),
+                attention_mask=torch.from_numpy(encoding['attention_mask'])
+            ).logits
+        torch_probs = torch.softmax(torch_logits, dim=1).numpy()
+        ort_probs = backend.predict_proba(encoding['input_ids'], encoding['attention_mask'])
+        
+        mismatches += int(np.sum(torch_probs.argmax(axis=1) != ort_probs.argmax(axis=1)))
+        max_prob_diff = max(max_prob_diff, float(np.abs(torch_probs - ort_probs).max()))
+    
+    parity = {
+        'samples': len(texts),
+        'mismatches': mismatches,
+        'agreement': 1.0 - mismatches / len(texts) if texts else 1.0,
+        'max_prob_diff': max_prob_diff
+    }
+    print(f"ONNX parity: {parity}")
+    if mismatches:
+        print(f"Warning: ONNX Runtime disagrees with torch on {mismatches} of {len(texts)} comments")
+    return parity
+
+def predict_labels(model, tokenizer, texts, precision='fp32', batch_size=32, max_length=128):
+    """Predict label ids for a list of texts with the given precision mode."""
+    model.eval()
+    predictions = []
+    for start in range(0, len(texts), batch_size):
+        encoding = tokenizer(
+            list(texts[start:start + batch_size]),
+            max_length=max_length,
+            padding=True,
+            truncation=True,
+            return_tensors='pt'
+        )
+        with torch.no_grad(), inference_context(precision):
+            logits = model(input_ids=encoding['input_ids'], attention_mask=encoding['attention_mask']).logits
+        predictions.extend(logits.float().argmax(dim=1).tolist())
+    return np.array(predictions)
+
+def evaluate_precision_modes(model_dir='models', precision='fp32'):
+    """
+    Check reduced-precision inference modes against the fp32 model.
+    
+    Evaluates fp32, int8 and bf16 on the held-out split, saves the int8
+    artifact and records the results and the default precision in the model manifest.
+    """
+    if precision not in PRECISION_MODES:
+        raise ValueError(f"Unknown precision mode: {precision}")
+    
+    model_info = load_model_info(model_dir)
+    
+    _, test_df = create_train_test_split()
+    texts = test_df['processed_text'].values
+    labels = test_df['label'].values
+    
+    tokenizer = BertTokenizerFast.from_pretrained(model_info['tokenizer_path'])
+    fp32_model = BertForSequenceClassification.from_pretrained(model_info['model_path'])
+    fp32_preds = predict_labels(fp32_model, tokenizer, texts)
+    
+    checks = {'fp32': {'accuracy': accuracy_score(labels, fp32_preds), 'agreement_with_fp32': 1.0}}
+    
+    # int8 dynamic quantization of the Linear layers
+    int8_model = quantize_dynamic_int8(copy.deepcopy(fp32_model))
+    int8_preds = predict_labels(int8_model, tokenizer, texts, precision='int8')
+    checks['int8'] = {
+        'accuracy': accuracy_score(labels, int8_preds),
+        'agreement_with_fp32': float(np.mean(int8_preds == fp32_preds))
+    }
+    
+    quantized_path = os.path.join(model_dir, 'bert_sentiment_model_int8.pt')
+    save_quantized_model(int8_model, quantized_path)
+    
+    # bf16 autocast over the fp32 weights
+    bf16_preds = predict_labels(fp32_model, tokenizer, texts, precision='bf16')
+    checks['bf16'] = {
+        'accuracy': accuracy_score(labels, bf16_preds),
+        'agreement_with_fp32': float(np.mean(bf16_preds == fp32_preds))
+    }
+    
+    for mode, result in checks.items():
+        result['accuracy_drop'] = checks['fp32']['accuracy'] - result['accuracy']
+        print(f"{mode}: accuracy={result['accuracy']:.4f} "
+              f"agreement_with_fp32={result['agreement_with_fp32']:.4f} "
+              f"accuracy_drop={result['accuracy_drop']:.4f}")
+    
+    model_info['precision'] = precision
+    model_info['quantized_model_path'] = quantized_path
+    model_info['precision_checks'] = checks
+    
+    save_model_info(model_dir, model_info)
+    
+    print(f"Default inference precision set to {precision}")
+    return checks
+
 if __name__ == "__main__":
-    print("=== Training Advanced BERT Sentiment Analysis Model ===")
-    model_info = train_model()
-    print(f"Model accuracy: {model_info['metrics']['eval_accuracy']:.4f}")
-    print("=== Training Complete ===")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the BERT sentiment analysis model")
+    parser.add_argument('--mode', choices=['full', 'distill', 'probe'], default='full',
+                        help='full: fine-tune bert-base-uncased; distill: train a small student from the saved model; '
+                             'probe: train only the classifier head on cached frozen embeddings')
+    parser.add_argument('--precision', choices=PRECISION_MODES, default=None,
+                        help='Check reduced-precision modes and record this one as the default in the model manifest')
+    parser.add_argument('--check-onnx-parity', action='store_true',
+                        help='Compare torch and ONNX Runtime predictions for the saved model')
+    parser.add_argument('--early-exit', action='store_true',
+                        help='Train early-exit heads on intermediate layers of the saved model')
+    parser.add_argument('--skip-training', action='store_true',
+                        help='Reuse the existing model instead of training a new one')
+    args = parser.parse_args()
+    
+    if not args.skip_training and args.mode == 'full':
+        print("=== Training Advanced BERT Sentiment Analysis Model ===")
+        model_info = train_model()
+        print(f"Model accuracy: {model_info['metrics']['eval_accuracy']:.4f}")
+        print("=== Training Complete ===")
+    
+    if not args.skip_training and args.mode == 'distill':
+        try:
+            from sentiment_analysis.distillation import train_distilled_model
+        except ImportError:
+            # Running as a script from inside sentiment_analysis/
+            from distillation import train_distilled_model
+        
+        print("=== Distilling Student Sentiment Model ===")
+        model_info = train_distilled_model()
+        print(f"Student accuracy: {model_info['metrics']['eval_accuracy']:.4f} "
+              f"(gap to teacher {model_info['metrics']['accuracy_gap']:.4f}, "
+              f"{model_info['metrics']['speedup']:.1f}x faster)")
+        print("=== Distillation Complete ===")
+    
+    if not args.skip_training and args.mode == 'probe':
+        try:
+            from sentiment_analysis.linear_probe import train_linear_probe
+        except ImportError:
+            # Running as a script from inside sentiment_analysis/
+            from linear_probe import train_linear_probe
+        
+        print("=== Training Linear Probe on Frozen Embeddings ===")
+        model_info = train_linear_probe()
+        print(f"Linear probe accuracy: {model_info['metrics']['eval_accuracy']:.4f} "
+              f"(head trained in {model_info['metrics']['head_seconds']}s)")
+        print("=== Linear Probe Complete ===")
+    
+    if args.early_exit:
+        try:
+            from sentiment_analysis.early_exit import train_early_exit
+        except ImportError:
+            # Running as a script from inside sentiment_analysis/
+            from early_exit import train_early_exit
+        
+        print("=== Training Early-Exit Heads ===")
+        early_exit_info = train_early_exit()
+        best = next(r for r in early_exit_info['evaluation'] if r['threshold'] == early_exit_info['threshold'])
+        print(f"Early exit at threshold {best['threshold']}: {best['avg_layers']:.2f} layers on average, "
+              f"accuracy {best['accuracy']:.4f} vs {best['full_depth_accuracy']:.4f} at full depth")
+    
+    if args.precision:
+        print("=== Checking Reduced-Precision Inference Modes ===")
+        evaluate_precision_modes(precision=args.precision)
+    
+    if args.check_onnx_parity:
+        print("=== Checking ONNX Runtime Parity ===")
+        saved_info = load_model_info('models')
+        parity = check_onnx_parity(
+            BertForSequenceClassification.from_pretrained(saved_info['model_path']),
+            BertTokenizerFast.from_pretrained(saved_info['tokenizer_path']),
+            saved_info['onnx_path']
+        )
+        if parity is None or parity['mismatches']:
+            raise SystemExit(1)
@@ -0,0 +1,286 @@
+"""
+Micro-benchmarks for the sentiment analysis pipeline.
+Run from the backend directory, e.g.:
+    python -m sentiment_analysis.benchmark tokenization --size 20000
+    python -m sentiment_analysis.benchmark memory --workers 4
+    python -m sentiment_analysis.benchmark compile --batch-size 8
+    python -m sentiment_analysis.benchmark preprocessing --size 1000000
+"""
+
+import os
+import gc
+import time
+import argparse
+
+
+def synthetic_corpus(size):
+    """Build a corpus of `size` synthetic YouTube comments from the training data generator."""
+    from sentiment_analysis.advanced_model import create_training_data
+
+    comments = create_training_data()['comment_text'].tolist()
+    repeats = size // len(comments) + 1
+    return (comments * repeats)[:size]
+
+
+def _report(name, items, tokens, seconds):
+    """Print and return one benchmark result row."""
+    result = {
+        'name': name,
+        'items': items,
+        'seconds': round(seconds, 3),
+        'items_per_sec': round(items / seconds, 1) if seconds else None,
+        'tokens_per_sec': round(tokens / seconds, 1) if seconds else None
+    }
+    print(f"{name:<32} {result['items_per_sec']:>12} items/s {result['tokens_per_sec']:>14} tokens/s")
+    return result
+
+
+def benchmark_tokenization(size=20000, max_length=128):
+    """Compare per-comment slow tokenization with the fast batch pipeline."""
+    from transformers import BertTokenizer
+    from sentiment_analysis.tokenization import load_fast_tokenizer, encode_batch, pad_batch
+
+    texts = synthetic_corpus(size)
+    slow = BertTokenizer.from_pretrained('bert-base-uncased')
+    fast = load_fast_tokenizer('bert-base-uncased')
+    tokens = sum(len(ids) for ids in encode_batch(fast, texts, max_length=max_length))
+
+    print(f"Tokenizing {size} synthetic comments ({tokens} tokens)")
+    results = []
+
+    # Before: one slow tokenizer call and one padded tensor per comment
+    start = time.perf_counter()
+    for text in texts:
+        slow(text, max_length=max_length, padding='max_length', truncation=True, return_tensors='pt')
+    results.append(_report('slow, per comment', size, tokens, time.perf_counter() - start))
+
+    # After: one fast tokenizer call for the corpus, padded into numpy arrays
+    start = time.perf_counter()
+    pad_batch(encode_batch(fast, texts, max_length=max_length), pad_token_id=fast.pad_token_id)
+    results.append(_report('fast, batched', size, tokens, time.perf_counter() - start))
+
+    speedup = results[1]['tokens_per_sec'] / results[0]['tokens_per_sec']
+    print(f"Speedup: {speedup:.1f}x")
+    return results
+
+
+def _memory_usage(pid='self'):
+    """Rss, Pss and shared/private page totals in MB from /proc/<pid>/smaps_rollup (Linux only)."""
+    usage = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss', 'Shared_Clean', 'Private_Dirty'):
+                usage[key.lower()] = round(int(rest.split()[0]) / 1024.0, 1)
+    return usage
+
+
+def _memory_worker(models_dir, preloaded, texts, barrier, results):
+    """Forked worker: load the model unless inherited, serve one batch, then report memory."""
+    from sentiment_analysis.model_loader import sentiment_analyzer
+
+    if not preloaded:
+        sentiment_analyzer.load_model(models_dir)
+    sentiment_analyzer.predict_batch(texts)
+    # Measure while every worker is alive so shared pages are split between them
+    barrier.wait()
+    results.put(_memory_usage())
+    barrier.wait()
+
+
+def benchmark_memory(models_dir=os.path.join('sentiment_analysis', 'models'), workers=4, modes=('eager', 'shared')):
+    """
+    Compare per-worker memory of forked workers that each load the model
+    ('eager': from_pretrained after fork, like app:app) against workers that
+    inherit memory-mapped weights loaded before the fork ('shared': like
+    create_app(preload_model=True) with gunicorn preload_app).
+    """
+    import multiprocessing
+
+    # Read when model_loader is imported: keep the benchmark to model weights only
+    os.environ['SENTIMENT_STORE_ENABLED'] = 'false'
+    os.environ['SENTIMENT_MICROBATCH'] = 'false'
+    os.environ['SENTIMENT_CASCADE'] = 'false'
+    from sentiment_analysis.model_loader import sentiment_analyzer
+
+    texts = synthetic_corpus(256)
+    context = multiprocessing.get_context('fork')
+    results = {}
+
+    # eager runs first, before the parent has loaded anything
+    for mode in [m for m in ('eager', 'shared') if m in modes]:
+        preloaded = mode == 'shared'
+        os.environ['SENTIMENT_MMAP_WEIGHTS'] = 'true' if preloaded else 'false'
+        if preloaded:
+            sentiment_analyzer.load_model(models_dir, warmup=False)
+            gc.freeze()
+
+        barrier = context.Barrier(workers + 1)
+        queue = context.Queue()
+        processes = [
+            context.Process(target=_memory_worker, args=(models_dir, preloaded, texts, barrier, queue))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        barrier.wait()
+        usage = [queue.get() for _ in processes]
+        barrier.wait()
+        for process in processes:
+            process.join()
+
+        results[mode] = {
+            'workers': workers,
+            'mean_rss_mb': round(sum(u['rss'] for u in usage) / workers, 1),
+            'mean_pss_mb': round(sum(u['pss'] for u in usage) / workers, 1),
+            # Pss splits shared pages between processes, so the sum is the real footprint
+            'total_pss_mb': round(sum(u['pss'] for u in usage), 1),
+            'mean_private_dirty_mb': round(sum(u['private_dirty'] for u in usage) / workers, 1)
+        }
+        print(f"{mode:<8} rss/worker {results[mode]['mean_rss_mb']:>9} MB  "
+              f"pss/worker {results[mode]['mean_pss_mb']:>9} MB  "
+              f"total pss {results[mode]['total_pss_mb']:>9} MB  "
+              f"private dirty/worker {results[mode]['mean_private_dirty_mb']:>9} MB")
+
+    if 'eager' in results and 'shared' in results and results['shared']['total_pss_mb']:
+        print(f"Total memory reduction: {results['eager']['total_pss_mb'] / results['shared']['total_pss_mb']:.1f}x")
+    return results
+
+
+def benchmark_compile(models_dir=os.path.join('sentiment_analysis', 'models'), batch_size=8, repeats=30):
+    """Median forward-pass latency per bucket length for the eager and TorchScript-traced classifier."""
+    import torch
+    from sentiment_analysis.compilation import BUCKET_LENGTHS, load_or_trace
+    from sentiment_analysis.inference_backends import TorchBackend
+    from sentiment_analysis.model_manifest import load_model_info, manifest_exists
+
+    model_path = os.path.join(models_dir, 'bert_sentiment_model')
+    if manifest_exists(models_dir):
+        model_path = load_model_info(models_dir)['model_path']
+
+    eager = TorchBackend(model_path, compile_mode='none').model
+    compiled, _ = load_or_trace(model_path, lambda: eager)
+    vocab_size = eager.config.vocab_size
+
+    def median_ms(fn):
+        fn()
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000.0)
+        return sorted(timings)[len(timings) // 2]
+
+    results = []
+    with torch.no_grad():
+        for length in BUCKET_LENGTHS:
+            input_ids = torch.randint(1000, vocab_size, (batch_size, length))
+            attention_mask = torch.ones_like(input_ids)
+            eager_ms = median_ms(lambda: eager(input_ids=input_ids, attention_mask=attention_mask))
+            compiled_ms = median_ms(lambda: compiled(input_ids, attention_mask))
+            results.append({
+                'length': length,
+                'batch_size': batch_size,
+                'eager_ms': round(eager_ms, 2),
+                'compiled_ms': round(compiled_ms, 2),
+                'speedup': round(eager_ms / compiled_ms, 2) if compiled_ms else None
+            })
+            print(f"length {length:>4}  eager {eager_ms:>9.2f} ms  torchscript {compiled_ms:>9.2f} ms  "
+                  f"speedup {results[-1]['speedup']}x")
+    return results
+
+
+def _legacy_clean(text):
+    """advanced_model.preprocess_text before the shared preprocessing module."""
+    import re
+    text = text.lower()
+    text = re.sub(r"http\S+|www\S+|https\S+", '', text, flags=re.MULTILINE)
+    text = re.sub(r'\@\w+|\#','', text)
+    text = re.sub(r'[^A-Za-z\s]+', '', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def _legacy_tfidf(text):
+    """The TF-IDF training scripts' preprocess_text before the shared preprocessing module."""
+    import re
+    import nltk
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+    text = text.lower()
+    text = re.sub(r"http\S+|www\S+|https\S+", '', text, flags=re.MULTILINE)
+    text = re.sub(r'\@\w+|\#','', text)
+    text = re.sub(r'[^a-zA-Z\s]', '', text)
+    tokens = nltk.word_tokenize(text)
+    stop_words = set(stopwords.words('english'))
+    lemmatizer = WordNetLemmatizer()
+    tokens = [lemmatizer.lemmatize(token) for token in tokens if token not in stop_words]
+    return ' '.join(tokens)
+
+
+def benchmark_preprocessing(size=1000000, legacy_size=20000):
+    """
+    Compare the old per-comment regex cleaning with the shared batch preprocessing.
+
+    Every comment gets a unique numeric suffix (removed by cleaning) so the
+    batch helpers cannot skip work by deduplicating. The legacy functions are
+    timed on the first legacy_size comments since they are too slow for the
+    full corpus; strings/sec is comparable between the two.
+    """
+    from sentiment_analysis.text_preprocessing import clean_texts, tfidf_preprocess_batch
+
+    texts = [f"{text} {i}" for i, text in enumerate(synthetic_corpus(size))]
+    legacy_texts = texts[:legacy_size]
+    words = sum(len(text.split()) for text in texts)
+    legacy_words = sum(len(text.split()) for text in legacy_texts)
+
+    print(f"Preprocessing {size} synthetic comments ({words} words), legacy on {len(legacy_texts)}")
+    results = []
+    for name, legacy, batch in (('clean', _legacy_clean, clean_texts),
+                                ('tfidf', _legacy_tfidf, tfidf_preprocess_batch)):
+        start = time.perf_counter()
+        for text in legacy_texts:
+            legacy(text)
+        before = _report(f"{name}, legacy per comment", len(legacy_texts), legacy_words, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        batch(texts)
+        after = _report(f"{name}, shared batch", size, words, time.perf_counter() - start)
+
+        print(f"Speedup: {after['items_per_sec'] / before['items_per_sec']:.1f}x strings/sec")
+        results.extend([before, after])
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sentiment pipeline micro-benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    tokenization_parser = subparsers.add_parser('tokenization', help='Tokens/sec of slow vs fast batch tokenization')
+    tokenization_parser.add_argument('--size', type=int, default=20000)
+
+    memory_parser = subparsers.add_parser('memory', help='Per-worker RSS/PSS with and without pre-fork model sharing')
+    memory_parser.add_argument('--workers', type=int, default=4)
+    memory_parser.add_argument('--models-dir', default=os.path.join('sentiment_analysis', 'models'))
+    memory_parser.add_argument('--mode', choices=['eager', 'shared', 'both'], default='both')
+
+    compile_parser = subparsers.add_parser('compile', help='Eager vs TorchScript latency per bucket length')
+    compile_parser.add_argument('--models-dir', default=os.path.join('sentiment_analysis', 'models'))
+    compile_parser.add_argument('--batch-size', type=int, default=8)
+    compile_parser.add_argument('--repeats', type=int, default=30)
+
+    preprocessing_parser = subparsers.add_parser('preprocessing', help='Strings/sec of legacy vs shared text cleaning')
+    preprocessing_parser.add_argument('--size', type=int, default=1000000)
+    preprocessing_parser.add_argument('--legacy-size', type=int, default=20000)
+
+    args = parser.parse_args()
+
+    if args.benchmark == 'tokenization':
+        benchmark_tokenization(size=args.size)
+    elif args.benchmark == 'memory':
+        modes = ('eager', 'shared') if args.mode == 'both' else (args.mode,)
+        benchmark_memory(models_dir=args.models_dir, workers=args.workers, modes=modes)
+    elif args.benchmark == 'compile':
+        benchmark_compile(models_dir=args.models_dir, batch_size=args.batch_size, repeats=args.repeats)
+    elif args.benchmark == 'preprocessing':
+        benchmark_preprocessing(size=args.size, legacy_size=args.legacy_size)
@@ -0,0 +1,83 @@
+"""
+Confidence-gated model cascade.
+Every comment first goes through the cheap TF-IDF + RandomForest model
+(sentiment_model.pkl from quick_train.py / train_default_model.py). Only
+comments whose top probability is below the threshold are escalated to BERT.
+"""
+
+import random
+import logging
+import threading
+import numpy as np
+
+from sentiment_analysis.text_preprocessing import tfidf_preprocess_batch
+
+logger = logging.getLogger(__name__)
+
+
+class CascadeClassifier:
+    """Wrap the sparse TF-IDF pipeline and decide which comments need BERT."""
+
+    def __init__(self, model_path, threshold=0.8, audit_rate=0.05):
+        import joblib
+
+        self.pipeline = joblib.load(model_path)
+        self.classes = [int(c) for c in self.pipeline.classes_]
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self._lock = threading.Lock()
+        self.items = 0
+        self.escalated = 0
+        self.escalated_agreed = 0
+        self.audited = 0
+        self.audited_agreed = 0
+        logger.info(f"Loaded cascade model from {model_path} (threshold={threshold})")
+
+    def predict_proba(self, texts):
+        """Return class probabilities as an array with one column per label id in self.classes."""
+        # Same stopword removal and lemmatization the pipeline was trained on
+        return self.pipeline.predict_proba(tfidf_preprocess_batch(list(texts)))
+
+    def route(self, texts):
+        """
+        Score texts with the sparse model.
+
+        Returns (probs, escalate, audit): the probability matrix, indices that
+        must go to BERT because they are below the threshold, and a random
+        sample of confident indices that also go to BERT to measure agreement.
+        """
+        probs = self.predict_proba(texts)
+        confidence = probs.max(axis=1)
+        escalate = [i for i in range(len(texts)) if confidence[i] < self.threshold]
+        audit = [i for i in range(len(texts))
+                 if confidence[i] >= self.threshold and random.random() < self.audit_rate]
+        return probs, escalate, audit
+
+    def record(self, cascade_labels, bert_labels, escalate, audit, total):
+        """Update escalation and agreement counters for one routed batch."""
+        with self._lock:
+            self.items += total
+            self.escalated += len(escalate)
+            self.escalated_agreed += sum(cascade_labels[i] == bert_labels[i] for i in escalate)
+            self.audited += len(audit)
+            self.audited_agreed += sum(cascade_labels[i] == bert_labels[i] for i in audit)
+
+    def label_ids(self, probs):
+        """Map probability rows to label ids."""
+        return [self.classes[i] for i in np.argmax(probs, axis=1)]
+
+    def stats(self):
+        """Escalation rate and cascade-vs-BERT agreement for threshold tuning."""
+        with self._lock:
+            return {
+                'threshold': self.threshold,
+                'audit_rate': self.audit_rate,
+                'items': self.items,
+                'escalated': self.escalated,
+                'escalation_rate': round(self.escalated / self.items, 4) if self.items else 0.0,
+                # Agreement on confident comments the cascade answered alone (sampled)
+                'audited': self.audited,
+                'confident_agreement': round(self.audited_agreed / self.audited, 4) if self.audited else None,
+                # Agreement on comments that were escalated to BERT
+                'escalated_agreement': round(self.escalated_agreed / self.escalated, 4) if self.escalated else None
+            }
@@ -0,0 +1,170 @@
+"""
+TorchScript compilation of the classifier for CPU serving.
+The classifier is traced once per bucketed sequence length into a single
+TorchScript module (one method per bucket, sharing one set of weights) and
+cached next to the model. Batches are padded up to the nearest bucket so
+every forward pass runs a pre-optimized graph.
+"""
+
+import os
+import glob
+import hashlib
+import logging
+import torch
+
+logger = logging.getLogger(__name__)
+
+COMPILE_MODES = ('none', 'torchscript')
+
+# Sequence lengths traced by default; the largest should cover the serving max_length
+BUCKET_LENGTHS = (16, 32, 64, 128)
+
+# Largest allowed difference between traced and eager logits
+PARITY_TOLERANCE = 1e-3
+
+
+class _TraceWrapper(torch.nn.Module):
+    """Expose the classifier as a positional-argument module that returns logits only."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids):
+        # token_type_ids are passed explicitly so the batch size is not baked into the graph
+        return self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            token_type_ids=token_type_ids,
+            return_dict=False
+        )[0]
+
+
+def _method_name(length):
+    return f"len{length}"
+
+
+def _example_inputs(length, batch_size, vocab_size):
+    generator = torch.Generator().manual_seed(length)
+    input_ids = torch.randint(1000, vocab_size, (batch_size, length), generator=generator)
+    attention_mask = torch.ones((batch_size, length), dtype=torch.long)
+    # Padding in the second row so the masked path is exercised
+    attention_mask[-1, length // 2:] = 0
+    return input_ids, attention_mask, torch.zeros_like(input_ids)
+
+
+def artifact_path(model_path, lengths=BUCKET_LENGTHS):
+    """
+    Cached artifact location inside the model directory. The file name is
+    keyed by the torch version, the bucket lengths and the weights file, so
+    retraining or upgrading torch produces a fresh trace.
+    """
+    fingerprint = [torch.__version__, ','.join(str(length) for length in sorted(lengths))]
+    for name in ('model.safetensors', 'pytorch_model.bin'):
+        weights = os.path.join(model_path, name)
+        if os.path.exists(weights):
+            stat = os.stat(weights)
+            fingerprint.append(f"{name}:{stat.st_size}:{int(stat.st_mtime)}")
+            break
+    digest = hashlib.sha1('|'.join(fingerprint).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(model_path, f"torchscript_{digest}.pt")
+
+
+def remove_stale_artifacts(model_path, keep):
+    """Delete cached traces in model_path other than keep; each is as large as the weights."""
+    for path in glob.glob(os.path.join(model_path, 'torchscript_*.pt')):
+        if os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        try:
+            os.remove(path)
+            logger.info(f"Removed stale TorchScript artifact {path}")
+        except OSError as e:
+            logger.warning(f"Could not remove stale TorchScript artifact {path}: {str(e)}")
+
+
+def trace_buckets(model, lengths=BUCKET_LENGTHS, batch_size=2):
+    """Trace model once per length into one ScriptModule with a lenN method per bucket."""
+    methods = {_method_name(length): _TraceWrapper.forward for length in lengths}
+    wrapper = type('BucketedClassifier', (_TraceWrapper,), methods)(model).eval()
+    vocab_size = model.config.vocab_size
+
+    with torch.no_grad():
+        traced = torch.jit.trace_module(
+            wrapper,
+            {_method_name(length): _example_inputs(length, batch_size, vocab_size) for length in lengths},
+            check_trace=False
+        )
+    return traced
+
+
+def check_parity(traced, model, lengths=BUCKET_LENGTHS, batch_size=3):
+    """Compare traced and eager logits at a batch size different from the trace. Raises on mismatch."""
+    vocab_size = model.config.vocab_size
+    with torch.no_grad():
+        for length in lengths:
+            inputs = _example_inputs(length, batch_size, vocab_size)
+            expected = model(input_ids=inputs[0], attention_mask=inputs[1], token_type_ids=inputs[2]).logits
+            actual = getattr(traced, _method_name(length))(*inputs)
+            diff = float((expected - actual).abs().max())
+            if diff > PARITY_TOLERANCE:
+                raise ValueError(f"Traced model differs from eager at length {length} (max diff {diff:.2e})")
+
+
+class BucketedTorchScript:
+    """Run a traced classifier, padding each batch to the nearest traced length."""
+
+    def __init__(self, module, lengths):
+        self.module = module
+        self.lengths = sorted(lengths)
+        self.calls = {length: 0 for length in self.lengths}
+
+    def bucket_for(self, width):
+        """Smallest traced length that fits width, or None if the batch is too long."""
+        for length in self.lengths:
+            if width <= length:
+                return length
+        return None
+
+    def __call__(self, input_ids, attention_mask):
+        """Return logits, or None if no traced length is long enough."""
+        length = self.bucket_for(input_ids.shape[1])
+        if length is None:
+            return None
+        extra = length - input_ids.shape[1]
+        if extra:
+            # Masked positions do not change the [CLS] output
+            input_ids = torch.nn.functional.pad(input_ids, (0, extra))
+            attention_mask = torch.nn.functional.pad(attention_mask, (0, extra))
+        self.calls[length] += 1
+        return getattr(self.module, _method_name(length))(input_ids, attention_mask, torch.zeros_like(input_ids))
+
+
+def load_or_trace(model_path, load_model, lengths=BUCKET_LENGTHS):
+    """
+    Return (BucketedTorchScript, eager model or None).
+
+    Uses the cached artifact when one exists for these weights; otherwise
+    calls load_model(), traces it, checks parity against eager and saves the
+    artifact. The eager model is returned when it had to be loaded so the
+    caller can reuse it instead of loading it again.
+    """
+    path = artifact_path(model_path, lengths)
+    if os.path.exists(path):
+        try:
+            logger.info(f"Loading TorchScript artifact from {path}")
+            return BucketedTorchScript(torch.jit.load(path, map_location='cpu'), lengths), None
+        except Exception as e:
+            logger.warning(f"Could not load TorchScript artifact {path}, tracing again: {str(e)}")
+
+    model = load_model()
+    traced = trace_buckets(model, lengths)
+    check_parity(traced, model, lengths)
+    try:
+        torch.jit.save(traced, path)
+        logger.info(f"Saved TorchScript artifact to {path}")
+    except OSError as e:
+        logger.warning(f"Could not cache TorchScript artifact: {str(e)}")
+    else:
+        # Traces of earlier weights, torch versions or bucket lengths would only pile up
+        remove_stale_artifacts(model_path, keep=path)
+    return BucketedTorchScript(traced, lengths), model
@@ -1,17 +1,18 @@
 # data_preparation.py
 
 import pandas as pd
-import re
+
+try:
+    from sentiment_analysis.text_preprocessing import clean_text, clean_texts
+except ImportError:
+    # Running as a script from inside sentiment_analysis/
+    from text_preprocessing import clean_text, clean_texts
 
 def clean_comment(comment):
     # Remove special characters, URLs, and numbers
-    comment = re.sub(r"http\S+|www\S+|https\S+", '', comment, flags=re.MULTILINE)
-    comment = re.sub(r'\@\w+|\#','', comment)
-    comment = re.sub(r'[^A-Za-z\s]+', '', comment)
-    comment = re.sub(r'\s+', ' ', comment).strip()
-    return comment
+    return clean_text(comment, lowercase=False)
 
 def load_and_clean_data(file_path):
     data = pd.read_csv(file_path)
-    data['comment_text'] = data['comment_text'].apply(clean_comment)
+    data['comment_text'] = clean_texts(data['comment_text'], lowercase=False)
     return data
@@ -0,0 +1,125 @@
+"""
+Cross-request micro-batching for sentiment inference.
+Concurrent callers enqueue their comments and a single background worker
+coalesces them into one forward pass, bounded by a max batch size and a
+max wait deadline. Each caller gets a future for its own slice of results.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    """One caller's texts and the future that receives its results."""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.future = Future()
+
+
+class InferenceDispatcher:
+    """Coalesce concurrent predict calls into shared batches on one worker thread."""
+
+    def __init__(self, predict_fn, max_batch_size=256, max_wait_ms=5):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self.batches = 0
+        self.requests = 0
+        self.items = 0
+        self.max_observed_batch = 0
+
+    def submit(self, texts):
+        """Queue texts for prediction. Returns a Future of (labels, probabilities)."""
+        request = _Request(list(texts))
+        if not request.texts:
+            request.future.set_result(([], []))
+            return request.future
+
+        self._ensure_worker()
+        self._queue.put(request)
+        return request.future
+
+    def predict(self, texts, timeout=None):
+        """Submit texts and wait for the results."""
+        return self.submit(texts).result(timeout=timeout)
+
+    def _ensure_worker(self):
+        """Start the worker thread, restarting it in a forked child process."""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._run, name='inference-dispatcher', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def _collect(self):
+        """Block for the first request, then gather more until the batch is full or the deadline passes."""
+        pending = [self._queue.get()]
+        size = len(pending[0].texts)
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(request)
+            size += len(request.texts)
+
+        return pending, size
+
+    def _run(self):
+        while True:
+            pending, size = self._collect()
+            texts = [text for request in pending for text in request.texts]
+
+            try:
+                labels, probabilities = self.predict_fn(texts)
+            except Exception as e:
+                logger.error(f"Error in batched inference: {str(e)}")
+                for request in pending:
+                    request.future.set_exception(e)
+                continue
+
+            # Hand each caller its own slice
+            offset = 0
+            for request in pending:
+                end = offset + len(request.texts)
+                request.future.set_result((labels[offset:end], probabilities[offset:end]))
+                offset = end
+
+            with self._lock:
+                self.batches += 1
+                self.requests += len(pending)
+                self.items += size
+                self.max_observed_batch = max(self.max_observed_batch, size)
+
+    def stats(self):
+        """Return batching counters and current queue depth."""
+        with self._lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'queue_depth': self._queue.qsize(),
+                'batches': self.batches,
+                'requests': self.requests,
+                'items': self.items,
+                'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+                'avg_requests_per_batch': round(self.requests / self.batches, 2) if self.batches else 0.0,
+                'max_observed_batch': self.max_observed_batch
+            }
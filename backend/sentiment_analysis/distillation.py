@@ -0,0 +1,217 @@
+"""
+Knowledge distillation of the fine-tuned BERT teacher into a small student.
+The student is a 4-layer, 256-wide BERT trained on the teacher's soft labels
+over scraped YouTube comments plus the synthetic training set. It is saved as
+a regular BertForSequenceClassification so model_loader loads it through the
+same model manifest mechanism as the teacher.
+"""
+
+import os
+import glob
+import time
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn.functional as F
+from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+from sklearn.metrics import accuracy_score
+
+try:
+    from sentiment_analysis.advanced_model import (
+        create_train_test_split, export_onnx, check_onnx_parity, init_resources, get_device
+    )
+    from sentiment_analysis.text_preprocessing import clean_texts
+    from sentiment_analysis.tokenization import encode_padded
+    from sentiment_analysis.model_manifest import load_model_info, save_model_info
+except ImportError:
+    # Running as a script from inside sentiment_analysis/
+    from advanced_model import (
+        create_train_test_split, export_onnx, check_onnx_parity, init_resources, get_device
+    )
+    from text_preprocessing import clean_texts
+    from tokenization import encode_padded
+    from model_manifest import load_model_info, save_model_info
+
+SCRAPED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scraper', 'output')
+
+# Student size: roughly 1/10 of bert-base compute per token
+STUDENT_CONFIG = {
+    'hidden_size': 256,
+    'num_hidden_layers': 4,
+    'num_attention_heads': 4,
+    'intermediate_size': 1024
+}
+
+
+def load_scraped_comments(output_dir=SCRAPED_DIR):
+    """Load and clean comment_text from every scraped CSV in output_dir."""
+    texts = []
+    for path in sorted(glob.glob(os.path.join(output_dir, '*.csv'))):
+        try:
+            df = pd.read_csv(path, on_bad_lines='skip')
+        except Exception as e:
+            print(f"Skipping {path}: {e}")
+            continue
+        if 'comment_text' in df.columns:
+            texts.extend(df['comment_text'].dropna().astype(str).tolist())
+
+    cleaned = clean_texts(texts)
+    return [text for text in cleaned if text]
+
+
+def teacher_logits(teacher, tokenizer, texts, device, batch_size=32, max_length=128):
+    """Run the teacher over texts and return its logits as a float tensor on CPU."""
+    teacher.eval()
+    outputs = []
+    for start in range(0, len(texts), batch_size):
+        input_ids, attention_mask = encode_padded(
+            tokenizer, texts[start:start + batch_size], max_length=max_length, padding='longest'
+        )
+        with torch.no_grad():
+            logits = teacher(
+                input_ids=torch.from_numpy(input_ids).to(device),
+                attention_mask=torch.from_numpy(attention_mask).to(device)
+            ).logits
+        outputs.append(logits.float().cpu())
+    return torch.cat(outputs)
+
+
+def measure_latency(model, tokenizer, texts, repeats=50, max_length=128):
+    """Median single-comment CPU latency in milliseconds."""
+    model = model.to('cpu').eval()
+    timings = []
+    for i in range(repeats):
+        input_ids, attention_mask = encode_padded(tokenizer, [texts[i % len(texts)]], max_length=max_length, padding='longest')
+        start = time.perf_counter()
+        with torch.no_grad():
+            model(input_ids=torch.from_numpy(input_ids), attention_mask=torch.from_numpy(attention_mask))
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return float(np.median(timings))
+
+
+def predict_ids(model, tokenizer, texts, batch_size=64, max_length=128):
+    """Predict label ids on CPU."""
+    model = model.to('cpu').eval()
+    predictions = []
+    for start in range(0, len(texts), batch_size):
+        input_ids, attention_mask = encode_padded(
+            tokenizer, texts[start:start + batch_size], max_length=max_length, padding='longest'
+        )
+        with torch.no_grad():
+            logits = model(input_ids=torch.from_numpy(input_ids), attention_mask=torch.from_numpy(attention_mask)).logits
+        predictions.extend(logits.argmax(dim=1).tolist())
+    return np.array(predictions)
+
+
+def train_distilled_model(model_dir='models', epochs=8, batch_size=32, learning_rate=5e-4,
+                          temperature=2.0, alpha=0.7, max_length=128):
+    """
+    Distill the saved teacher into a small student model.
+
+    Loss is alpha * KL(student || teacher) at the given temperature plus
+    (1 - alpha) * cross-entropy on the synthetic labels (scraped comments
+    have no labels and only contribute the distillation term).
+    """
+    init_resources(model_dir)
+    device = get_device()
+
+    model_info = load_model_info(model_dir)
+    # Re-distilling: always start from the original teacher
+    teacher_info = model_info.get('teacher', model_info)
+
+    tokenizer = BertTokenizerFast.from_pretrained(teacher_info['tokenizer_path'])
+    teacher = BertForSequenceClassification.from_pretrained(teacher_info['model_path']).to(device)
+
+    train_df, test_df = create_train_test_split()
+    scraped = load_scraped_comments()
+    texts = train_df['processed_text'].tolist() + scraped
+    hard_labels = torch.tensor(train_df['label'].tolist() + [-100] * len(scraped), dtype=torch.long)
+    print(f"Distilling on {len(train_df)} labeled and {len(scraped)} scraped comments")
+
+    soft_targets = teacher_logits(teacher, tokenizer, texts, device, max_length=max_length)
+    input_ids, attention_mask = encode_padded(tokenizer, texts, max_length=max_length)
+    input_ids, attention_mask = torch.from_numpy(input_ids), torch.from_numpy(attention_mask)
+
+    config = BertConfig(
+        vocab_size=tokenizer.vocab_size,
+        num_labels=teacher.config.num_labels,
+        max_position_embeddings=teacher.config.max_position_embeddings,
+        **STUDENT_CONFIG
+    )
+    student = BertForSequenceClassification(config).to(device)
+    optimizer = torch.optim.AdamW(student.parameters(), lr=learning_rate)
+
+    for epoch in range(epochs):
+        student.train()
+        order = torch.randperm(len(texts))
+        total_loss = 0.0
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            # Trim padding to the longest comment in this batch
+            width = int(attention_mask[idx].sum(dim=1).max())
+            logits = student(
+                input_ids=input_ids[idx, :width].to(device),
+                attention_mask=attention_mask[idx, :width].to(device)
+            ).logits
+
+            distill_loss = F.kl_div(
+                F.log_softmax(logits / temperature, dim=1),
+                F.softmax(soft_targets[idx].to(device) / temperature, dim=1),
+                reduction='batchmean'
+            ) * temperature ** 2
+            labels = hard_labels[idx].to(device)
+            if (labels != -100).any():
+                hard_loss = F.cross_entropy(logits, labels, ignore_index=-100)
+            else:
+                hard_loss = torch.zeros((), device=device)
+            loss = alpha * distill_loss + (1 - alpha) * hard_loss
+
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item()
+
+        print(f"Epoch {epoch + 1}/{epochs} - loss: {total_loss / max(1, len(texts) // batch_size):.4f}")
+
+    # Evaluate student against the teacher on the held-out split
+    test_texts = test_df['processed_text'].tolist()
+    test_labels = test_df['label'].values
+    teacher_preds = predict_ids(teacher, tokenizer, test_texts)
+    student_preds = predict_ids(student, tokenizer, test_texts)
+    teacher_latency = measure_latency(teacher, tokenizer, test_texts)
+    student_latency = measure_latency(student, tokenizer, test_texts)
+
+    metrics = {
+        'eval_accuracy': accuracy_score(test_labels, student_preds),
+        'teacher_accuracy': accuracy_score(test_labels, teacher_preds),
+        'agreement_with_teacher': float(np.mean(student_preds == teacher_preds)),
+        'teacher_latency_ms': teacher_latency,
+        'student_latency_ms': student_latency,
+        'speedup': teacher_latency / student_latency if student_latency else None
+    }
+    metrics['accuracy_gap'] = metrics['teacher_accuracy'] - metrics['eval_accuracy']
+    print(f"Distillation results: {metrics}")
+
+    student_path = os.path.join(model_dir, 'student_sentiment_model')
+    student.save_pretrained(student_path, safe_serialization=True)
+    onnx_path = os.path.join(model_dir, 'student_sentiment_model.onnx')
+    export_onnx(student, tokenizer, onnx_path)
+
+    student_info = {
+        'model_type': 'distilled_bert',
+        'version': time.strftime('%Y%m%d%H%M%S'),
+        'model_path': student_path,
+        'tokenizer_path': teacher_info['tokenizer_path'],
+        'onnx_path': onnx_path,
+        'backend': 'torch',
+        'metrics': metrics,
+        'labels': teacher_info.get('labels', {0: 'negative', 1: 'positive', 2: 'neutral'}),
+        'student_config': STUDENT_CONFIG,
+        'teacher': teacher_info
+    }
+    student_info['onnx_parity'] = check_onnx_parity(student, tokenizer, onnx_path)
+
+    save_model_info(model_dir, student_info)
+
+    print(f"Student model saved to {student_path}")
+    return student_info
@@ -0,0 +1,297 @@
+"""
+Early-exit inference for the fine-tuned BERT classifier.
+Small classifier heads are trained on the [CLS] state of intermediate encoder
+layers while the fine-tuned backbone stays frozen. At inference time each
+comment stops at the first exit whose prediction entropy is below a
+threshold, so easy comments skip most of the 12 encoder layers.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+logger = logging.getLogger(__name__)
+
+HEADS_NAME = 'early_exit_heads.safetensors'
+
+# Entropy thresholds (nats, max ln(3) ~ 1.10 for three labels) evaluated after training
+EVAL_THRESHOLDS = (0.05, 0.1, 0.2, 0.3, 0.4, 0.5)
+
+
+class ExitHead(torch.nn.Module):
+    """Pooler-style head (dense + tanh + classifier) on one layer's [CLS] state."""
+
+    def __init__(self, hidden_size, num_labels):
+        super().__init__()
+        self.dense = torch.nn.Linear(hidden_size, hidden_size)
+        self.classifier = torch.nn.Linear(hidden_size, num_labels)
+
+    def forward(self, hidden_states):
+        return self.classifier(torch.tanh(self.dense(hidden_states[:, 0])))
+
+
+class ExitHeads(torch.nn.Module):
+    """One ExitHead per exit layer, keyed by the number of encoder layers run before it."""
+
+    def __init__(self, hidden_size, num_labels, exit_layers):
+        super().__init__()
+        self.exit_layers = sorted(exit_layers)
+        self.heads = torch.nn.ModuleDict({
+            str(layer): ExitHead(hidden_size, num_labels) for layer in self.exit_layers
+        })
+
+    def forward(self, layer, hidden_states):
+        return self.heads[str(layer)](hidden_states)
+
+    @classmethod
+    def for_model(cls, model, exit_layers=None):
+        """Build heads for model, initializing each dense layer from the BERT pooler."""
+        config = model.config
+        exit_layers = exit_layers or list(range(2, config.num_hidden_layers))
+        heads = cls(config.hidden_size, config.num_labels, exit_layers)
+        with torch.no_grad():
+            for head in heads.heads.values():
+                head.dense.load_state_dict(model.bert.pooler.dense.state_dict())
+        return heads
+
+
+def entropy(probs):
+    """Prediction entropy per row in nats."""
+    return -(probs * torch.log(probs.clamp_min(1e-12))).sum(dim=-1)
+
+
+def save_exit_heads(heads, model_dir):
+    """Save head weights next to the model. Returns the manifest entry for them."""
+    from safetensors.torch import save_file
+
+    path = os.path.join(model_dir, HEADS_NAME)
+    save_file({name: tensor.contiguous() for name, tensor in heads.state_dict().items()}, path)
+    return {'heads_path': path, 'exit_layers': heads.exit_layers}
+
+
+def load_exit_heads(model, early_exit_info):
+    """Load heads described by the manifest's early_exit entry."""
+    from safetensors.torch import load_file
+
+    heads = ExitHeads(model.config.hidden_size, model.config.num_labels, early_exit_info['exit_layers'])
+    heads.load_state_dict(load_file(early_exit_info['heads_path']))
+    return heads.eval()
+
+
+class EarlyExitRunner:
+    """Run the encoder layer by layer and let confident comments exit early."""
+
+    def __init__(self, model, heads, threshold=0.2, audit_rate=0.0):
+        self.model = model
+        self.heads = heads
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self.num_layers = model.config.num_hidden_layers
+        self._lock = threading.Lock()
+        self.items = 0
+        self.batches = 0
+        self.layers_executed = 0
+        self.exits = {layer: 0 for layer in heads.exit_layers + [self.num_layers]}
+        self.audited = 0
+        self.audited_agreed = 0
+
+    def forward(self, input_ids, attention_mask):
+        """
+        Return (probabilities, layers) where layers holds the number of encoder
+        layers each row ran before exiting. Rows that exit are dropped from the
+        batch, so later layers only run on the comments that are still unsure.
+        """
+        bert = self.model.bert
+        batch_size = input_ids.shape[0]
+        probs = torch.zeros((batch_size, self.model.config.num_labels), device=input_ids.device)
+        layers = torch.full((batch_size,), self.num_layers, dtype=torch.long)
+
+        hidden = bert.embeddings(input_ids=input_ids)
+        mask = attention_mask
+        active = torch.arange(batch_size, device=input_ids.device)
+
+        for index, layer_module in enumerate(bert.encoder.layer):
+            extended_mask = bert.get_extended_attention_mask(mask, mask.shape)
+            hidden = layer_module(hidden, attention_mask=extended_mask)[0]
+            layer = index + 1
+            if layer == self.num_layers or str(layer) not in self.heads.heads:
+                continue
+
+            row_probs = torch.softmax(self.heads(layer, hidden).float(), dim=-1)
+            done = entropy(row_probs) < self.threshold
+            if done.any():
+                probs[active[done]] = row_probs[done]
+                layers[active[done].cpu()] = layer
+                keep = ~done
+                active, hidden, mask = active[keep], hidden[keep], mask[keep]
+                if not len(active):
+                    return probs, layers
+
+        logits = self.model.classifier(bert.pooler(hidden))
+        probs[active] = torch.softmax(logits.float(), dim=-1)
+        return probs, layers
+
+    def predict_proba(self, input_ids, attention_mask):
+        """Early-exit class probabilities for a padded batch, recording layer statistics."""
+        probs, layers = self.forward(input_ids, attention_mask)
+        self._audit(input_ids, attention_mask, probs, layers)
+
+        with self._lock:
+            self.batches += 1
+            self.items += len(layers)
+            self.layers_executed += int(layers.sum())
+            for layer in layers.tolist():
+                self.exits[layer] += 1
+        return probs
+
+    def _audit(self, input_ids, attention_mask, probs, layers):
+        """Re-run a random sample of early exits at full depth to measure agreement online."""
+        if not self.audit_rate:
+            return
+        rows = [i for i in range(len(layers))
+                if layers[i] < self.num_layers and random.random() < self.audit_rate]
+        if not rows:
+            return
+        logits = self.model(input_ids=input_ids[rows], attention_mask=attention_mask[rows]).logits
+        agreed = int((logits.argmax(dim=-1) == probs[rows].argmax(dim=-1)).sum())
+        with self._lock:
+            self.audited += len(rows)
+            self.audited_agreed += agreed
+
+    def stats(self):
+        """Average layers executed and exit distribution since load."""
+        with self._lock:
+            return {
+                'threshold': self.threshold,
+                'batches': self.batches,
+                'items': self.items,
+                'avg_layers': round(self.layers_executed / self.items, 2) if self.items else None,
+                'full_depth_layers': self.num_layers,
+                'exits_by_layer': {str(layer): count for layer, count in self.exits.items()},
+                'audited': self.audited,
+                'agreement_with_full_depth': round(self.audited_agreed / self.audited, 4) if self.audited else None
+            }
+
+
+def evaluate_early_exit(model, heads, input_ids, attention_mask, labels, thresholds=EVAL_THRESHOLDS, batch_size=64):
+    """Accuracy and average layers per threshold, compared with full-depth inference."""
+    model.eval()
+    heads.eval()
+    full_preds = []
+    with torch.no_grad():
+        for start in range(0, len(labels), batch_size):
+            full_preds.append(model(
+                input_ids=input_ids[start:start + batch_size],
+                attention_mask=attention_mask[start:start + batch_size]
+            ).logits.argmax(dim=-1))
+    full_preds = torch.cat(full_preds).cpu().numpy()
+    full_accuracy = float(np.mean(full_preds == labels))
+
+    results = []
+    for threshold in thresholds:
+        runner = EarlyExitRunner(model, heads, threshold)
+        preds, layers = [], []
+        with torch.no_grad():
+            for start in range(0, len(labels), batch_size):
+                probs, batch_layers = runner.forward(
+                    input_ids[start:start + batch_size], attention_mask[start:start + batch_size]
+                )
+                preds.append(probs.argmax(dim=-1).cpu())
+                layers.append(batch_layers)
+        preds = torch.cat(preds).numpy()
+        accuracy = float(np.mean(preds == labels))
+        results.append({
+            'threshold': threshold,
+            'accuracy': accuracy,
+            'full_depth_accuracy': full_accuracy,
+            'accuracy_drop': full_accuracy - accuracy,
+            'agreement_with_full_depth': float(np.mean(preds == full_preds)),
+            'avg_layers': float(torch.cat(layers).float().mean())
+        })
+        print(f"threshold={threshold:.2f} accuracy={accuracy:.4f} (full depth {full_accuracy:.4f}) "
+              f"avg_layers={results[-1]['avg_layers']:.2f}/{model.config.num_hidden_layers}")
+    return results
+
+
+def train_early_exit(model_dir='models', epochs=3, batch_size=32, learning_rate=1e-3,
+                     max_length=128, max_accuracy_drop=0.01):
+    """
+    Train exit heads on the saved fine-tuned model and record them in the manifest.
+
+    The backbone is frozen; each head is trained with cross-entropy on its
+    layer's [CLS] state. The default threshold is the largest evaluated one
+    whose accuracy drop against full depth stays within max_accuracy_drop.
+    """
+    from transformers import BertForSequenceClassification, BertTokenizerFast
+    try:
+        from sentiment_analysis.advanced_model import create_train_test_split, get_device
+        from sentiment_analysis.model_manifest import load_model_info, save_model_info
+        from sentiment_analysis.tokenization import encode_padded
+    except ImportError:
+        # Running as a script from inside sentiment_analysis/
+        from advanced_model import create_train_test_split, get_device
+        from model_manifest import load_model_info, save_model_info
+        from tokenization import encode_padded
+
+    device = get_device()
+    model_info = load_model_info(model_dir)
+    tokenizer = BertTokenizerFast.from_pretrained(model_info['tokenizer_path'])
+    model = BertForSequenceClassification.from_pretrained(model_info['model_path']).to(device).eval()
+    for param in model.parameters():
+        param.requires_grad = False
+
+    heads = ExitHeads.for_model(model).to(device)
+    optimizer = torch.optim.AdamW(heads.parameters(), lr=learning_rate)
+
+    train_df, test_df = create_train_test_split()
+    input_ids, attention_mask = encode_padded(tokenizer, train_df['processed_text'].tolist(), max_length=max_length)
+    input_ids, attention_mask = torch.from_numpy(input_ids), torch.from_numpy(attention_mask)
+    labels = torch.tensor(train_df['label'].tolist(), dtype=torch.long)
+
+    start_time = time.time()
+    for epoch in range(epochs):
+        heads.train()
+        order = torch.randperm(len(labels))
+        total_loss = 0.0
+        for start in range(0, len(labels), batch_size):
+            idx = order[start:start + batch_size]
+            width = int(attention_mask[idx].sum(dim=1).max())
+            with torch.no_grad():
+                hidden_states = model.bert(
+                    input_ids=input_ids[idx, :width].to(device),
+                    attention_mask=attention_mask[idx, :width].to(device),
+                    output_hidden_states=True
+                ).hidden_states
+            # hidden_states[0] is the embedding output, hidden_states[n] the output of layer n
+            batch_labels = labels[idx].to(device)
+            loss = sum(F.cross_entropy(heads(layer, hidden_states[layer]), batch_labels)
+                       for layer in heads.exit_layers)
+
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item()
+
+        print(f"Epoch {epoch + 1}/{epochs} - loss: {total_loss / max(1, len(labels) // batch_size):.4f}")
+    print(f"Exit heads trained in {time.time() - start_time:.1f}s")
+
+    test_ids, test_mask = encode_padded(tokenizer, test_df['processed_text'].tolist(), max_length=max_length)
+    evaluation = evaluate_early_exit(
+        model, heads, torch.from_numpy(test_ids).to(device), torch.from_numpy(test_mask).to(device),
+        test_df['label'].values
+    )
+    within_budget = [r for r in evaluation if r['accuracy_drop'] <= max_accuracy_drop]
+    threshold = max(within_budget, key=lambda r: r['threshold'])['threshold'] if within_budget else min(EVAL_THRESHOLDS)
+
+    early_exit_info = save_exit_heads(heads.cpu(), model_info['model_path'])
+    early_exit_info.update({'threshold': threshold, 'evaluation': evaluation})
+    model_info['early_exit'] = early_exit_info
+    save_model_info(model_dir, model_info)
+
+    print(f"Early-exit heads saved with default threshold {threshold}")
+    return early_exit_info
@@ -1,34 +1,133 @@
 # feature_extraction.py
 
-from transformers import BertTokenizer, BertModel
+import os
+import json
+import hashlib
+import numpy as np
+from transformers import BertModel
 import torch
 
-def extract_features_bert(data, max_length=128, device='cuda'):
-    tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-    model = BertModel.from_pretrained('bert-base-uncased').to(device)
-    
-    def tokenize_and_pad(text):
-        encoding = tokenizer.encode_plus(
-            text,
-            max_length=max_length,
-            truncation=True,
-            padding='max_length',
-            return_tensors='pt'
-        )
-        return encoding['input_ids'].squeeze(), encoding['attention_mask'].squeeze()
-
-    input_ids = []
-    attention_masks = []
-    
-    for text in data['comment_text']:
-        ids, mask = tokenize_and_pad(text)
-        input_ids.append(ids)
-        attention_masks.append(mask)
-    
-    input_ids = torch.stack(input_ids).to(device)
-    attention_masks = torch.stack(attention_masks).to(device)
-    
-    with torch.no_grad():
-        model_output = model(input_ids, attention_mask=attention_masks)
-    
-    return model_output.last_hidden_state[:, 0, :].cpu().numpy()  # Get the embeddings from [CLS] token
+try:
+    from sentiment_analysis.tokenization import load_fast_tokenizer, encode_padded
+except ImportError:
+    from tokenization import load_fast_tokenizer, encode_padded
+
+# Loaded extractors by (model name, device), so repeated calls reuse the model
+_extractors = {}
+
+
+class BertFeatureExtractor:
+    """Streaming [CLS] embedding extractor. The tokenizer and model are loaded once per handle."""
+
+    def __init__(self, model_name='bert-base-uncased', device='cpu', batch_size=64, max_length=128):
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.tokenizer = load_fast_tokenizer(model_name)
+        self.model = BertModel.from_pretrained(model_name).to(device).eval()
+
+    @property
+    def hidden_size(self):
+        return self.model.config.hidden_size
+
+    def embed(self, texts):
+        """[CLS] embeddings for one batch of texts, padded only to the longest text."""
+        input_ids, attention_mask = encode_padded(self.tokenizer, texts, max_length=self.max_length, padding='longest')
+        with torch.no_grad():
+            output = self.model(
+                torch.from_numpy(input_ids).to(self.device),
+                attention_mask=torch.from_numpy(attention_mask).to(self.device)
+            )
+        return output.last_hidden_state[:, 0, :].float().cpu().numpy()
+
+    def iter_batches(self, texts, start=0):
+        """Yield (row offset, embeddings) for consecutive batches of texts from row start."""
+        for offset in range(start, len(texts), self.batch_size):
+            yield offset, self.embed(texts[offset:offset + self.batch_size])
+
+    def extract(self, texts):
+        """Embed texts batch by batch into an in-memory array."""
+        texts = [str(text) for text in texts]
+        features = np.zeros((len(texts), self.hidden_size), dtype=np.float32)
+        for offset, embeddings in self.iter_batches(texts):
+            features[offset:offset + len(embeddings)] = embeddings
+        return features
+
+    def corpus_key(self, texts):
+        """Identify the model, max_length and corpus an output file belongs to."""
+        digest = hashlib.sha1(f"{self.model_name}|{self.max_length}".encode('utf-8'))
+        for text in texts:
+            digest.update(text.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def extract_to_file(self, texts, output_path, resume=True, checkpoint_every=20):
+        """
+        Stream embeddings into a memory-mapped .npy file at output_path.
+
+        Progress is recorded in output_path + '.progress.json' every
+        checkpoint_every batches; an interrupted run over the same corpus
+        resumes from the last checkpoint. Returns the array opened read-only.
+        """
+        texts = [str(text) for text in texts]
+        progress_path = f"{output_path}.progress.json"
+        key = self.corpus_key(texts)
+        shape = (len(texts), self.hidden_size)
+
+        done = 0
+        if resume and os.path.exists(output_path) and os.path.exists(progress_path):
+            with open(progress_path, 'r', encoding='utf-8') as f:
+                progress = json.load(f)
+            if progress.get('key') == key:
+                done = progress['rows_done']
+        if done >= len(texts) and os.path.exists(output_path):
+            return np.load(output_path, mmap_mode='r')
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        if done:
+            print(f"Resuming extraction at row {done}/{len(texts)}")
+            features = np.load(output_path, mmap_mode='r+')
+        else:
+            features = np.lib.format.open_memmap(output_path, mode='w+', dtype=np.float32, shape=shape)
+
+        def checkpoint(array, rows_done):
+            array.flush()
+            tmp_path = f"{progress_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'rows_done': rows_done, 'total': len(texts)}, f)
+            os.replace(tmp_path, progress_path)
+
+        for batch, (offset, embeddings) in enumerate(self.iter_batches(texts, start=done), 1):
+            features[offset:offset + len(embeddings)] = embeddings
+            if batch % checkpoint_every == 0:
+                checkpoint(features, offset + len(embeddings))
+        checkpoint(features, len(texts))
+        del features
+
+        return np.load(output_path, mmap_mode='r')
+
+
+def get_extractor(model_name='bert-base-uncased', device='cpu', batch_size=64, max_length=128):
+    """Return a cached extractor for the model and device, creating it on first use."""
+    key = (model_name, str(device))
+    extractor = _extractors.get(key)
+    if extractor is None:
+        extractor = _extractors[key] = BertFeatureExtractor(model_name, device, batch_size, max_length)
+    extractor.batch_size = batch_size
+    extractor.max_length = max_length
+    return extractor
+
+
+def extract_features_bert(data, max_length=128, device='cuda', batch_size=64, output_path=None):
+    """
+    [CLS] embeddings for data['comment_text'], computed in batches.
+
+    With output_path the embeddings are streamed to a memory-mapped .npy file
+    (resuming an interrupted run) instead of being held in memory.
+    """
+    extractor = get_extractor(device=device, batch_size=batch_size, max_length=max_length)
+    texts = data['comment_text'].tolist()
+    if output_path:
+        return extractor.extract_to_file(texts, output_path)
+    return extractor.extract(texts)
@@ -0,0 +1,287 @@
+"""
+Inference backends used by SentimentAnalyzer.
+Each backend takes padded input ids and attention masks as numpy arrays and
+returns class probabilities as a numpy array. Heavy runtimes are imported only
+when the backend is constructed, so the ONNX Runtime backend never imports torch.
+"""
+
+import os
+import json
+import struct
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('torch', 'onnx')
+
+SAFETENSORS_NAME = 'model.safetensors'
+
+# safetensors dtype names -> torch dtype attribute names
+_SAFETENSORS_DTYPES = {
+    'F64': 'float64', 'F32': 'float32', 'F16': 'float16', 'BF16': 'bfloat16',
+    'I64': 'int64', 'I32': 'int32', 'I16': 'int16', 'I8': 'int8', 'U8': 'uint8', 'BOOL': 'bool'
+}
+
+
+def softmax(logits):
+    """Numerically stable softmax over the last axis."""
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def load_mmap_state_dict(path):
+    """
+    Build a state dict whose tensors are views into a private memory map of a
+    safetensors file. Pages are read from the OS page cache on first touch and
+    stay shared between processes (including forked gunicorn workers) until a
+    tensor is written to.
+    """
+    import torch
+
+    with open(path, 'rb') as f:
+        header_size = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_size))
+    data_start = 8 + header_size
+
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=os.path.getsize(path))
+    state_dict = {}
+    for name, entry in header.items():
+        if name == '__metadata__':
+            continue
+        dtype = getattr(torch, _SAFETENSORS_DTYPES[entry['dtype']])
+        begin, end = entry['data_offsets']
+        offset = data_start + begin
+        itemsize = torch.empty((), dtype=dtype).element_size()
+        if offset % itemsize:
+            # Misaligned for this dtype: copy instead of viewing the map
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                raw = bytearray(f.read(end - begin))
+            state_dict[name] = torch.frombuffer(raw, dtype=dtype).reshape(entry['shape'])
+            continue
+        tensor = torch.empty(0, dtype=dtype)
+        tensor.set_(storage, offset // itemsize, entry['shape'])
+        state_dict[name] = tensor
+    return state_dict
+
+
+def load_mmap_model(model_path):
+    """Load a BertForSequenceClassification whose weights are memory-mapped from model.safetensors."""
+    from transformers import BertConfig, BertForSequenceClassification
+
+    config = BertConfig.from_pretrained(model_path)
+    try:
+        # Skip random initialization, the weights are replaced right away
+        from transformers.modeling_utils import no_init_weights
+        with no_init_weights():
+            model = BertForSequenceClassification(config)
+    except ImportError:
+        model = BertForSequenceClassification(config)
+
+    state_dict = load_mmap_state_dict(os.path.join(model_path, SAFETENSORS_NAME))
+    result = model.load_state_dict(state_dict, strict=False, assign=True)
+    # position_ids and similar non-persistent buffers are not stored in the file
+    missing = [key for key in result.missing_keys if not key.endswith('position_ids')]
+    if missing:
+        raise ValueError(f"Weights missing from {model_path}: {missing}")
+    return model
+
+
+class TorchBackend:
+    """Run the fine-tuned BertForSequenceClassification with PyTorch."""
+
+    name = 'torch'
+
+    def __init__(self, model_path, model_info=None, precision=None, compile_mode=None):
+        import torch
+        from transformers import BertForSequenceClassification
+        from sentiment_analysis.precision import (
+            PRECISION_MODES, quantize_dynamic_int8, inference_context, load_quantized_model
+        )
+
+        model_info = model_info or {}
+        self.torch = torch
+        self.inference_context = inference_context
+        self.model_path = model_path
+        self.model = None
+        self.mmap = False
+        self.compiled = None
+        self.compile_error = None
+        self.eager_fallbacks = 0
+        self.early_exit = None
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+        precision = precision or os.environ.get('SENTIMENT_PRECISION') or model_info.get('precision', 'fp32')
+        if precision not in PRECISION_MODES:
+            logger.warning(f"Unknown precision mode '{precision}', falling back to fp32")
+            precision = 'fp32'
+        self.precision = precision
+
+        compile_mode = compile_mode or os.environ.get('SENTIMENT_COMPILE', 'none')
+        if compile_mode not in ('none', 'torchscript'):
+            logger.warning(f"Unknown compile mode '{compile_mode}', using eager inference")
+            compile_mode = 'none'
+        early_exit = os.environ.get('SENTIMENT_EARLY_EXIT', 'false').lower() == 'true'
+        if early_exit and compile_mode != 'none':
+            # The traced graph always runs every layer
+            logger.warning("Early exit is enabled, skipping TorchScript compilation")
+            compile_mode = 'none'
+
+        if precision == 'int8':
+            # Quantized kernels only run on CPU
+            self.device = torch.device("cpu")
+            quantized_path = model_info.get('quantized_model_path')
+            if quantized_path and os.path.exists(quantized_path):
+                logger.info(f"Loading int8 model from {quantized_path}")
+                self.model = load_quantized_model(quantized_path)
+            else:
+                logger.info("No int8 artifact found, quantizing model at load time")
+                self.model = quantize_dynamic_int8(BertForSequenceClassification.from_pretrained(model_path))
+            self.model.eval()
+        elif compile_mode == 'torchscript' and precision == 'fp32' and self.device.type == 'cpu':
+            self._compile()
+
+        if self.model is None and self.compiled is None:
+            self._load_eager()
+        if early_exit:
+            self._load_early_exit(model_info.get('early_exit'))
+        self.compile_mode = 'torchscript' if self.compiled is not None else 'none'
+        logger.info(f"Using {precision} torch inference on {self.device} (compile={self.compile_mode})")
+
+    def _load_eager(self):
+        """Load the eager model, memory-mapping safetensors weights on CPU when possible."""
+        from transformers import BertForSequenceClassification
+
+        if self.device.type == 'cpu' and self._use_mmap(self.model_path):
+            logger.info(f"Memory-mapping model weights from {self.model_path}")
+            self.model = load_mmap_model(self.model_path)
+            self.mmap = True
+        else:
+            self.model = BertForSequenceClassification.from_pretrained(self.model_path)
+        self.model.to(self.device)
+        self.model.eval()
+        return self.model
+
+    def _compile(self):
+        """Trace the model per bucket length (or load the cached trace), staying eager on failure."""
+        from sentiment_analysis.compilation import load_or_trace
+
+        try:
+            self.compiled, model = load_or_trace(self.model_path, self._load_eager)
+            # Reuse the eager model if it was loaded for tracing; otherwise it is loaded on demand
+            self.model = model
+        except Exception as e:
+            self.compiled = None
+            self.compile_error = str(e)
+            logger.warning(f"TorchScript compilation failed, using eager inference: {str(e)}")
+
+    def _load_early_exit(self, early_exit_info):
+        """Attach the early-exit heads from the manifest, staying at full depth if they are unavailable."""
+        from sentiment_analysis.early_exit import EarlyExitRunner, load_exit_heads
+
+        if not early_exit_info:
+            logger.warning("Early exit enabled but the model has no exit heads; train them with --early-exit")
+            return
+        try:
+            heads = load_exit_heads(self.model, early_exit_info).to(self.device)
+            threshold = float(os.environ.get('SENTIMENT_EARLY_EXIT_THRESHOLD') or early_exit_info.get('threshold', 0.2))
+            self.early_exit = EarlyExitRunner(
+                self.model, heads, threshold,
+                audit_rate=float(os.environ.get('SENTIMENT_EARLY_EXIT_AUDIT_RATE', 0.02))
+            )
+            logger.info(f"Early exit enabled at layers {heads.exit_layers} (entropy threshold {threshold})")
+        except Exception as e:
+            logger.warning(f"Could not load early-exit heads, using full depth: {str(e)}")
+
+    def compile_stats(self):
+        """Compile mode, per-bucket call counts and how often eager had to be used."""
+        return {
+            'mode': self.compile_mode,
+            'error': self.compile_error,
+            'bucket_calls': dict(self.compiled.calls) if self.compiled is not None else None,
+            'eager_fallbacks': self.eager_fallbacks
+        }
+
+    @staticmethod
+    def _use_mmap(model_path):
+        """Memory-map safetensors weights unless disabled with SENTIMENT_MMAP_WEIGHTS=false."""
+        if os.environ.get('SENTIMENT_MMAP_WEIGHTS', 'true').lower() != 'true':
+            return False
+        return os.path.exists(os.path.join(model_path, SAFETENSORS_NAME))
+
+    def predict_proba(self, input_ids, attention_mask):
+        """Return class probabilities for a padded batch."""
+        torch = self.torch
+        input_ids = torch.as_tensor(input_ids).to(self.device)
+        attention_mask = torch.as_tensor(attention_mask).to(self.device)
+        with torch.no_grad(), self.inference_context(self.precision, self.device.type):
+            if self.early_exit is not None:
+                return self.early_exit.predict_proba(input_ids, attention_mask).float().cpu().numpy()
+            logits = None
+            if self.compiled is not None:
+                try:
+                    logits = self.compiled(input_ids, attention_mask)
+                except Exception as e:
+                    logger.warning(f"Compiled inference failed, running eager: {str(e)}")
+            if logits is None:
+                # Longer than every traced bucket, or compiled inference failed
+                if self.compiled is not None:
+                    self.eager_fallbacks += 1
+                model = self.model if self.model is not None else self._load_eager()
+                logits = model(input_ids=input_ids, attention_mask=attention_mask).logits
+            return torch.softmax(logits.float(), dim=1).cpu().numpy()
+
+
+class OnnxBackend:
+    """Run an exported ONNX classifier with ONNX Runtime on CPU."""
+
+    name = 'onnx'
+    precision = 'fp32'
+
+    def __init__(self, onnx_path, num_threads=None):
+        import onnxruntime as ort
+
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(f"ONNX model not found at {onnx_path}")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        num_threads = num_threads or int(os.environ.get('SENTIMENT_ORT_THREADS', 0))
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(onnx_path, sess_options=options, providers=['CPUExecutionProvider'])
+        logger.info(f"Using ONNX Runtime inference from {onnx_path}")
+
+    def predict_proba(self, input_ids, attention_mask):
+        """Return class probabilities for a padded batch."""
+        logits = self.session.run(['logits'], {
+            'input_ids': np.asarray(input_ids, dtype=np.int64),
+            'attention_mask': np.asarray(attention_mask, dtype=np.int64)
+        })[0]
+        return softmax(logits)
+
+
+def create_backend(model_path, model_info=None, precision=None, backend=None):
+    """
+    Build the inference backend named by the argument, the SENTIMENT_BACKEND
+    environment variable or the model manifest, in that order. Defaults to torch.
+    """
+    model_info = model_info or {}
+    backend = backend or os.environ.get('SENTIMENT_BACKEND') or model_info.get('backend', 'torch')
+
+    if backend == 'onnx':
+        onnx_path = model_info.get('onnx_path') or os.path.join(
+            os.path.dirname(model_path.rstrip('/\\')), 'bert_sentiment_model.onnx'
+        )
+        if os.path.exists(onnx_path):
+            return OnnxBackend(onnx_path)
+        logger.error(
+            f"ONNX backend requested but no exported model at {onnx_path}; falling back to torch. "
+            f"Training with `python -m sentiment_analysis.advanced_model` exports it next to the model."
+        )
+    elif backend != 'torch':
+        logger.warning(f"Unknown inference backend '{backend}', falling back to torch")
+    return TorchBackend(model_path, model_info, precision)
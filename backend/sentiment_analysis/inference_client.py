@@ -0,0 +1,143 @@
+"""
+Client for the local inference daemon (inference_daemon.py).
+Messages are length-prefixed JSON over a Unix domain socket. The client
+keeps one connection per thread and reconnects after a fork or a dropped
+connection, so it can be created before gunicorn forks its workers.
+"""
+
+import os
+import json
+import socket
+import struct
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = '/tmp/sentiment-inference.sock'
+
+# 4-byte big-endian payload length
+_HEADER = struct.Struct('>I')
+
+
+def _recv_exact(sock, size):
+    """Read exactly size bytes. Returns None if the peer closed before sending anything."""
+    chunks = []
+    received = 0
+    while received < size:
+        chunk = sock.recv(size - received)
+        if not chunk:
+            if received == 0:
+                return None
+            raise ConnectionError("Connection closed mid-message")
+        chunks.append(chunk)
+        received += len(chunk)
+    return b''.join(chunks)
+
+
+def send_message(sock, message):
+    """Send one JSON message."""
+    payload = json.dumps(message).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def recv_message(sock):
+    """Receive one JSON message. Returns None when the connection was closed cleanly."""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    payload = _recv_exact(sock, _HEADER.unpack(header)[0])
+    if payload is None:
+        raise ConnectionError("Connection closed mid-message")
+    return json.loads(payload.decode('utf-8'))
+
+
+class InferenceClient:
+    """Send prediction requests to the inference daemon."""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, timeout=30.0, reload_timeout=600.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.reload_timeout = reload_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.items = 0
+        self.errors = 0
+        self.reconnects = 0
+
+    def _connection(self):
+        """Return this thread's socket, connecting on first use and again after a fork."""
+        sock = getattr(self._local, 'sock', None)
+        if sock is None or self._local.pid != os.getpid():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+            self._local.pid = os.getpid()
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def request(self, message, timeout=None):
+        """Send a message and return the daemon's reply, reconnecting once if the connection dropped."""
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                sock.settimeout(timeout or self.timeout)
+                send_message(sock, message)
+                reply = recv_message(sock)
+                if reply is None:
+                    raise ConnectionError("Inference daemon closed the connection")
+                return reply
+            except (OSError, ConnectionError) as e:
+                self._close()
+                if attempt:
+                    with self._lock:
+                        self.errors += 1
+                    raise
+                with self._lock:
+                    self.reconnects += 1
+                logger.warning(f"Inference daemon connection failed, reconnecting: {str(e)}")
+
+    def predict(self, texts):
+        """Predict texts on the daemon. Returns (labels, probabilities) like SentimentAnalyzer.predict_batch."""
+        texts = [str(text) for text in texts]
+        reply = self.request({'op': 'predict', 'texts': texts})
+        with self._lock:
+            self.requests += 1
+            self.items += len(texts)
+            if 'error' in reply:
+                self.errors += 1
+        if 'error' in reply:
+            raise RuntimeError(f"Inference daemon error: {reply['error']}")
+        return reply['labels'], reply['probabilities']
+
+    def status(self):
+        """Return the daemon's model state and queue/batching statistics."""
+        return self.request({'op': 'status'})
+
+    def reload(self, models_dir=None):
+        """Ask the daemon to reload its model, by default from the directory it was started with."""
+        message = {'op': 'reload'}
+        if models_dir:
+            message['models_dir'] = models_dir
+        return self.request(message, timeout=self.reload_timeout)
+
+    def stats(self):
+        """Return client-side request counters."""
+        with self._lock:
+            return {
+                'socket_path': self.socket_path,
+                'requests': self.requests,
+                'items': self.items,
+                'errors': self.errors,
+                'reconnects': self.reconnects
+            }
@@ -0,0 +1,152 @@
+"""
+Local inference daemon.
+Owns the sentiment model and serves predictions to every API worker over a
+Unix domain socket. Each connection is handled on its own thread and all
+requests go through the analyzer's micro-batching dispatcher, so comments
+from different workers share forward passes. Run from the backend directory:
+    python -m sentiment_analysis.inference_daemon --socket /tmp/sentiment-inference.sock
+API workers use it when SENTIMENT_INFERENCE_SOCKET points at the same path.
+"""
+
+import os
+import time
+import logging
+import argparse
+import threading
+import socketserver
+
+from sentiment_analysis.inference_client import DEFAULT_SOCKET_PATH, send_message, recv_message
+from sentiment_analysis.model_loader import SentimentAnalyzer
+
+logger = logging.getLogger(__name__)
+
+
+class _ConnectionHandler(socketserver.BaseRequestHandler):
+    """Serve length-prefixed JSON requests from one API worker connection."""
+
+    def handle(self):
+        daemon = self.server.inference_daemon
+        daemon.connection_opened()
+        try:
+            while True:
+                message = recv_message(self.request)
+                if message is None:
+                    return
+                send_message(self.request, daemon.handle(message))
+        except (OSError, ConnectionError) as e:
+            logger.debug(f"Connection closed: {str(e)}")
+        finally:
+            daemon.connection_closed()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class InferenceDaemon:
+    """Serve predictions from one SentimentAnalyzer to many API workers over a Unix socket."""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, analyzer=None):
+        self.socket_path = socket_path
+        # Never proxy to ourselves, whatever SENTIMENT_INFERENCE_SOCKET says
+        self.analyzer = analyzer or SentimentAnalyzer(inference_socket='')
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self.connections = 0
+        self.total_connections = 0
+        self.requests = 0
+        self.items = 0
+        self.errors = 0
+        self.server = None
+
+    def connection_opened(self):
+        with self._lock:
+            self.connections += 1
+            self.total_connections += 1
+
+    def connection_closed(self):
+        with self._lock:
+            self.connections -= 1
+
+    def handle(self, message):
+        """Answer one request message."""
+        op = message.get('op')
+        if op == 'predict':
+            texts = message.get('texts') or []
+            try:
+                labels, probabilities = self.analyzer.predict(texts)
+            except Exception as e:
+                logger.error(f"Error serving prediction request: {str(e)}")
+                with self._lock:
+                    self.errors += 1
+                return {'error': str(e)}
+            with self._lock:
+                self.requests += 1
+                self.items += len(texts)
+            return {'labels': labels, 'probabilities': probabilities}
+        if op == 'status':
+            return self.status()
+        if op == 'reload':
+            return self.reload(message.get('models_dir'))
+        return {'error': f"Unknown operation: {op}"}
+
+    def reload(self, models_dir=None):
+        """
+        Reload the model (e.g. after retraining) from models_dir, or the
+        directory it was loaded from. The old model keeps serving meanwhile.
+        Returns the status with 'reloaded' telling whether the new model is in place.
+        """
+        logger.info("Reloading model on request")
+        reloaded = self.analyzer.load_model(models_dir)
+        return dict(self.status(), reloaded=reloaded)
+
+    def status(self):
+        """Model state plus connection, queue depth and batch-size statistics."""
+        with self._lock:
+            daemon_stats = {
+                'pid': os.getpid(),
+                'uptime_seconds': round(time.time() - self.started_at, 1),
+                'connections': self.connections,
+                'total_connections': self.total_connections,
+                'requests': self.requests,
+                'items': self.items,
+                'errors': self.errors
+            }
+        return {
+            'ready': self.analyzer.is_ready(),
+            'state': self.analyzer.state,
+            'error': self.analyzer.load_error,
+            'model_version': self.analyzer.model_version,
+            'daemon': daemon_stats,
+            # microbatch holds queue_depth and avg_batch_size across all workers
+            'inference': self.analyzer.get_stats()
+        }
+
+    def serve_forever(self, models_dir=None):
+        """Load the model, bind the socket and serve until interrupted."""
+        self.analyzer.load_model(models_dir)
+
+        # A socket file left behind by a previous run blocks bind()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.server = _UnixServer(self.socket_path, _ConnectionHandler)
+        self.server.inference_daemon = self
+        logger.info(f"Inference daemon listening on {self.socket_path} (state={self.analyzer.state})")
+
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve sentiment predictions to API workers over a Unix socket")
+    parser.add_argument('--socket', default=os.environ.get('SENTIMENT_INFERENCE_SOCKET') or DEFAULT_SOCKET_PATH)
+    parser.add_argument('--models-dir', default=os.path.join('sentiment_analysis', 'models'))
+    args = parser.parse_args()
+
+    InferenceDaemon(args.socket).serve_forever(args.models_dir)
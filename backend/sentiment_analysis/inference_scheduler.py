@@ -0,0 +1,61 @@
+"""
+Length-bucketed batch scheduler for sentiment inference.
+Groups comments of similar token length so that each batch is only padded
+to its own longest member instead of a fixed max_length.
+"""
+
+
+class LengthBucketScheduler:
+    """Plan inference batches under a token budget, sorted by sequence length."""
+
+    def __init__(self, max_tokens=4096, max_batch_size=64, max_length=128):
+        self.max_tokens = max_tokens
+        self.max_batch_size = max_batch_size
+        self.max_length = max_length
+
+    def schedule(self, lengths):
+        """
+        Split item indices into batches ordered by token length.
+
+        A batch is closed once adding the next item would push
+        (batch size * longest member) over max_tokens, or once it
+        reaches max_batch_size. Returns a list of lists of the original
+        indices; callers use them to scatter results back into input order.
+        """
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+
+        batches = []
+        current = []
+        for idx in order:
+            length = min(lengths[idx], self.max_length)
+            # Items are sorted ascending, so the newest item is always the longest
+            if current and (length * (len(current) + 1) > self.max_tokens
+                            or len(current) >= self.max_batch_size):
+                batches.append(current)
+                current = []
+            current.append(idx)
+
+        if current:
+            batches.append(current)
+
+        return batches
+
+    def padding_stats(self, lengths, batches):
+        """Compare the padded token count of a schedule against fixed max_length padding."""
+        real_tokens = sum(min(length, self.max_length) for length in lengths)
+        padded_tokens = sum(
+            len(batch) * max(min(lengths[i], self.max_length) for i in batch)
+            for batch in batches
+        )
+        fixed_tokens = len(lengths) * self.max_length
+        saved_tokens = fixed_tokens - padded_tokens
+
+        return {
+            'items': len(lengths),
+            'batches': len(batches),
+            'real_tokens': real_tokens,
+            'padded_tokens': padded_tokens,
+            'fixed_padding_tokens': fixed_tokens,
+            'padding_saved_tokens': saved_tokens,
+            'padding_saved_pct': round(100.0 * saved_tokens / fixed_tokens, 1) if fixed_tokens else 0.0
+        }
@@ -0,0 +1,179 @@
+"""
+Fast linear-probe training on cached frozen BERT embeddings.
+The pretrained encoder is never updated: pooled [CLS] embeddings are
+computed once per comment into an on-disk cache, and only the classification
+head is trained on them. Retraining after new labels arrive only embeds the
+new comments. The result is saved as a regular BertForSequenceClassification
+(pretrained encoder + trained classifier) so model_loader serves it unchanged.
+"""
+
+import os
+import time
+import hashlib
+import numpy as np
+import torch
+import torch.nn.functional as F
+from transformers import BertModel, BertForSequenceClassification, BertTokenizerFast
+from sklearn.metrics import accuracy_score
+
+try:
+    from sentiment_analysis.advanced_model import create_train_test_split, export_onnx, init_resources, get_device
+    from sentiment_analysis.text_preprocessing import clean_text
+    from sentiment_analysis.model_manifest import save_model_info
+    from sentiment_analysis.prediction_cache import text_hash
+    from sentiment_analysis.tokenization import encode_padded
+except ImportError:
+    # Running as a script from inside sentiment_analysis/
+    from advanced_model import create_train_test_split, export_onnx, init_resources, get_device
+    from text_preprocessing import clean_text
+    from model_manifest import save_model_info
+    from prediction_cache import text_hash
+    from tokenization import encode_padded
+
+LABEL_IDS = {'negative': 0, 'positive': 1, 'neutral': 2}
+
+
+class EmbeddingCache:
+    """On-disk cache of pooled encoder embeddings keyed by comment text hash."""
+
+    def __init__(self, cache_dir, base_model, max_length):
+        key = hashlib.sha1(f"{base_model}|{max_length}".encode('utf-8')).hexdigest()[:12]
+        self.path = os.path.join(cache_dir, f"embeddings_{key}.npz")
+        self.index = {}
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)
+        if os.path.exists(self.path):
+            data = np.load(self.path)
+            self.embeddings = data['embeddings']
+            self.index = {hashed: row for row, hashed in enumerate(data['hashes'].tolist())}
+
+    def missing(self, hashes):
+        """Hashes not in the cache yet, in first-seen order."""
+        return [hashed for hashed in dict.fromkeys(hashes) if hashed not in self.index]
+
+    def add(self, hashes, embeddings):
+        start = len(self.index)
+        self.embeddings = embeddings if not start else np.concatenate([self.embeddings, embeddings])
+        for offset, hashed in enumerate(hashes):
+            self.index[hashed] = start + offset
+
+    def lookup(self, hashes):
+        return self.embeddings[[self.index[hashed] for hashed in hashes]]
+
+    def save(self):
+        """Write the cache atomically."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        hashes = sorted(self.index, key=self.index.get)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, hashes=np.array(hashes), embeddings=self.embeddings)
+        os.replace(tmp_path, self.path)
+
+
+def pooled_embeddings(encoder, tokenizer, texts, device, batch_size=64, max_length=128):
+    """Pooler output of the frozen encoder, i.e. the input of BertForSequenceClassification's classifier."""
+    encoder.eval()
+    outputs = []
+    for start in range(0, len(texts), batch_size):
+        input_ids, attention_mask = encode_padded(
+            tokenizer, texts[start:start + batch_size], max_length=max_length, padding='longest'
+        )
+        with torch.no_grad():
+            pooled = encoder(
+                input_ids=torch.from_numpy(input_ids).to(device),
+                attention_mask=torch.from_numpy(attention_mask).to(device)
+            ).pooler_output
+        outputs.append(pooled.float().cpu().numpy())
+    return np.concatenate(outputs) if outputs else np.zeros((0, encoder.config.hidden_size), dtype=np.float32)
+
+
+def train_linear_probe(model_dir='models', base_model='bert-base-uncased', extra_examples=None,
+                       epochs=300, learning_rate=1e-2, weight_decay=1e-4, max_length=128, export=True):
+    """
+    Train only the classification head on cached frozen embeddings.
+
+    extra_examples is an optional list of (text, label) pairs, label being a
+    label id or name, added to the training split (e.g. newly labeled comments).
+    """
+    init_resources(model_dir)
+    device = get_device()
+    timings = {}
+
+    train_df, test_df = create_train_test_split()
+    train_texts = train_df['processed_text'].tolist()
+    train_labels = train_df['label'].tolist()
+    for text, label in extra_examples or []:
+        processed = clean_text(text)
+        if processed:
+            train_texts.append(processed)
+            train_labels.append(LABEL_IDS[label] if isinstance(label, str) else int(label))
+    test_texts = test_df['processed_text'].tolist()
+
+    tokenizer = BertTokenizerFast.from_pretrained(base_model)
+    cache = EmbeddingCache(os.path.join(model_dir, 'embedding_cache'), base_model, max_length)
+    train_hashes = [text_hash(text) for text in train_texts]
+    test_hashes = [text_hash(text) for text in test_texts]
+    missing = cache.missing(train_hashes + test_hashes)
+
+    start = time.perf_counter()
+    if missing:
+        texts_by_hash = dict(zip(train_hashes + test_hashes, train_texts + test_texts))
+        encoder = BertModel.from_pretrained(base_model).to(device)
+        cache.add(missing, pooled_embeddings(encoder, tokenizer, [texts_by_hash[h] for h in missing], device,
+                                             max_length=max_length))
+        cache.save()
+        del encoder
+    timings['embedding_seconds'] = round(time.perf_counter() - start, 2)
+    print(f"Embedded {len(missing)} new comments ({len(cache.index)} cached) in {timings['embedding_seconds']}s")
+
+    # Full-batch training of the classifier head on the cached embeddings
+    start = time.perf_counter()
+    features = torch.from_numpy(cache.lookup(train_hashes)).to(device)
+    labels = torch.tensor(train_labels, dtype=torch.long, device=device)
+    head = torch.nn.Linear(features.shape[1], len(LABEL_IDS)).to(device)
+    optimizer = torch.optim.AdamW(head.parameters(), lr=learning_rate, weight_decay=weight_decay)
+    for _ in range(epochs):
+        loss = F.cross_entropy(head(features), labels)
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+    timings['head_seconds'] = round(time.perf_counter() - start, 2)
+
+    with torch.no_grad():
+        test_preds = head(torch.from_numpy(cache.lookup(test_hashes)).to(device)).argmax(dim=1).cpu().numpy()
+    metrics = {
+        'eval_accuracy': accuracy_score(test_df['label'].values, test_preds),
+        'train_loss': loss.item(),
+        'train_examples': len(train_labels),
+        'embedded_new': len(missing),
+        **timings
+    }
+    print(f"Linear probe results: {metrics}")
+
+    # Pretrained encoder + pooler with the trained head as its classifier
+    model = BertForSequenceClassification.from_pretrained(base_model, num_labels=len(LABEL_IDS))
+    with torch.no_grad():
+        model.classifier.weight.copy_(head.weight.cpu())
+        model.classifier.bias.copy_(head.bias.cpu())
+
+    model_path = os.path.join(model_dir, 'linear_probe_sentiment_model')
+    tokenizer_path = os.path.join(model_dir, 'linear_probe_tokenizer')
+    model.save_pretrained(model_path, safe_serialization=True)
+    tokenizer.save_pretrained(tokenizer_path)
+
+    model_info = {
+        'model_type': 'linear_probe',
+        'version': time.strftime('%Y%m%d%H%M%S'),
+        'model_path': model_path,
+        'tokenizer_path': tokenizer_path,
+        'backend': 'torch',
+        'base_model': base_model,
+        'metrics': metrics,
+        'labels': {label_id: name for name, label_id in LABEL_IDS.items()}
+    }
+    if export:
+        # Keep the ONNX backend in step with the new weights
+        model_info['onnx_path'] = export_onnx(model, tokenizer, os.path.join(model_dir, 'linear_probe_sentiment_model.onnx'))
+
+    save_model_info(model_dir, model_info)
+    print(f"Linear probe model saved to {model_path}")
+    return model_info
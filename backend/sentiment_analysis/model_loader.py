@@ -4,10 +4,19 @@ This provides a clean interface for the Flask API to use the model.
 """
 
 import os
-import torch
-import pickle
-from transformers import BertTokenizer, BertForSequenceClassification
+import time
 import logging
+import threading
+from sentiment_analysis.inference_scheduler import LengthBucketScheduler
+from sentiment_analysis.inference_backends import create_backend
+from sentiment_analysis.prediction_cache import LRUPredictionCache, text_hash, cache_key
+from sentiment_analysis.prediction_store import PredictionStore
+from sentiment_analysis.tokenization import load_fast_tokenizer, encode_batch, pad_batch
+from sentiment_analysis.model_manifest import load_model_info, manifest_exists
+from sentiment_analysis.dispatcher import InferenceDispatcher
+from sentiment_analysis.cascade import CascadeClassifier
+from sentiment_analysis.text_preprocessing import check_tfidf_resources
+from sentiment_analysis.inference_client import InferenceClient
 
 # Configure logging
 logging.basicConfig(
@@ -16,25 +25,174 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Loading states reported by SentimentAnalyzer.state
+STATE_UNLOADED = 'unloaded'
+STATE_LOADING = 'loading'
+STATE_LOADED = 'loaded'
+STATE_READY = 'ready'
+STATE_FAILED = 'failed'
+
+# Representative comment lengths (in tokens) used to warm up the model
+WARMUP_LENGTHS = (16, 32, 64, 128)
+
 class SentimentAnalyzer:
     """Class to handle sentiment analysis with BERT model."""
     
-    def __init__(self):
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model = None
+    def __init__(self, inference_socket=None):
+        self.backend = None
         self.tokenizer = None
         self.model_loaded = False
+        self.models_dir = os.environ.get('SENTIMENT_MODELS_DIR', 'models')
+        self.state = STATE_UNLOADED
+        self.load_error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.warmup_enabled = os.environ.get('SENTIMENT_WARMUP', 'true').lower() == 'true'
+        self.load_retry_seconds = float(os.environ.get('SENTIMENT_LOAD_RETRY_SECONDS', 30))
+        self._failed_at = None
+        self._load_lock = threading.RLock()
+        self.model_version = None
         self.label_map = {0: 'negative', 1: 'positive', 2: 'neutral'}
+        self.batch_size = int(os.environ.get('SENTIMENT_BATCH_SIZE', 32))
+        self.max_batch_tokens = int(os.environ.get('SENTIMENT_MAX_BATCH_TOKENS', 4096))
+        self.padding_totals = {'items': 0, 'batches': 0, 'padded_tokens': 0,
+                               'fixed_padding_tokens': 0, 'padding_saved_tokens': 0}
+        self.cache = LRUPredictionCache(
+            max_size=int(os.environ.get('SENTIMENT_CACHE_SIZE', 10000)),
+            ttl_seconds=int(os.environ.get('SENTIMENT_CACHE_TTL', 0))
+        )
+        self.deduplicated = 0
+        self.store = None
+        self.early_exit_evaluation = None
+        self.cascade = None
+        self.cascade_enabled = os.environ.get('SENTIMENT_CASCADE', 'false').lower() == 'true'
+        self.dispatcher = None
+        # With SENTIMENT_INFERENCE_SOCKET set, predictions are served by the inference daemon
+        if inference_socket is None:
+            inference_socket = os.environ.get('SENTIMENT_INFERENCE_SOCKET', '')
+        self.remote = None
+        if inference_socket:
+            self.remote = InferenceClient(
+                inference_socket, timeout=float(os.environ.get('SENTIMENT_INFERENCE_TIMEOUT', 30)),
+                reload_timeout=float(os.environ.get('SENTIMENT_INFERENCE_RELOAD_TIMEOUT', 600))
+            )
+        elif os.environ.get('SENTIMENT_MICROBATCH', 'true').lower() == 'true':
+            self.dispatcher = InferenceDispatcher(
+                self.predict_batch,
+                max_batch_size=int(os.environ.get('SENTIMENT_MICROBATCH_SIZE', 256)),
+                max_wait_ms=float(os.environ.get('SENTIMENT_MICROBATCH_WAIT_MS', 5))
+            )
+        
+    def load_model(self, models_dir=None, precision=None, backend=None, warmup=None):
+        """
+        Load the BERT model and tokenizer, then warm it up.
+        
+        Only one thread loads at a time; the analyzer moves through the
+        unloaded -> loading -> ready/failed states and is only reported ready
+        once warm-up has succeeded. When reloading a ready model the previous
+        one keeps serving until the new one is in place.
+        
+        backend selects the runtime ('torch' or 'onnx') and precision the torch
+        inference mode ('fp32', 'int8' or 'bf16'). When not given they are taken
+        from the SENTIMENT_BACKEND / SENTIMENT_PRECISION environment variables and
+        then from the model manifest, defaulting to torch in fp32.
+        
+        warmup=False skips warm-up and leaves the analyzer in the 'loaded' state
+        until warm_up() is called; this is used when loading in the gunicorn
+        master before forking, where running inference would start thread pools
+        that do not survive the fork.
+        
+        When using the inference daemon the first call only checks that the
+        daemon is up and has its model loaded; later calls (e.g. after
+        retraining) ask the daemon to reload its model from its own models
+        directory.
+        """
+        with self._load_lock:
+            if models_dir:
+                self.models_dir = models_dir
+            serving = self.state in (STATE_READY, STATE_LOADED)
+            if not serving:
+                self.state = STATE_LOADING
+            
+            warmup = self.warmup_enabled if warmup is None else warmup
+            start = time.perf_counter()
+            if self.remote is not None:
+                loaded = self._connect_remote(reload=serving)
+                warmup = True
+            else:
+                loaded = self._load_model(self.models_dir, precision, backend)
+            warmed = True
+            if loaded and warmup and self.remote is None:
+                warmed = self.warm_up()
+            self.load_seconds = round(time.perf_counter() - start, 3)
+            
+            if loaded and not warmed:
+                # The weights loaded but cannot run inference; warm_up() set load_error
+                self.state = STATE_LOADED
+            elif loaded:
+                self.state = STATE_READY if warmup or not self.warmup_enabled else STATE_LOADED
+                self.load_error = None
+                self._failed_at = None
+            else:
+                self._failed_at = time.monotonic()
+                if not serving:
+                    self.state = STATE_FAILED
+            return loaded
+    
+    def ensure_loaded(self):
+        """Load the model if needed. Concurrent callers wait for a single loader."""
+        if self.state in (STATE_READY, STATE_LOADED):
+            return True
         
-    def load_model(self, models_dir='models'):
-        """Load the BERT model and tokenizer."""
+        with self._load_lock:
+            # Another thread may have finished loading while we waited
+            if self.state in (STATE_READY, STATE_LOADED):
+                return True
+            if self._failed_at is not None and time.monotonic() - self._failed_at < self.load_retry_seconds:
+                return False
+            logger.warning("Model not loaded, attempting to load...")
+            return self.load_model()
+    
+    def is_ready(self):
+        """True once the model is loaded and warmed up."""
+        return self.state == STATE_READY
+    
+    def warm_up(self, lengths=WARMUP_LENGTHS, batch_size=8):
+        """
+        Run dummy batches at representative sequence lengths so the first
+        request is not cold. Returns False, with load_error set and the
+        analyzer left unready, if the model fails to run them.
+        """
+        if self.remote is not None:
+            # The daemon warms up its own model
+            return True
+        start = time.perf_counter()
+        try:
+            cls_id, sep_id = self.tokenizer.cls_token_id, self.tokenizer.sep_token_id
+            filler = self.tokenizer.convert_tokens_to_ids('the')
+            for length in lengths:
+                ids = [cls_id] + [filler] * (length - 2) + [sep_id]
+                input_ids, attention_mask = pad_batch([ids] * batch_size, pad_token_id=self.tokenizer.pad_token_id)
+                self.backend.predict_proba(input_ids, attention_mask)
+        except Exception as e:
+            self.load_error = f"Model warm-up failed: {str(e)}"
+            logger.error(self.load_error)
+            return False
+        self.warmup_seconds = round(time.perf_counter() - start, 3)
+        logger.info(f"Model warm-up over lengths {list(lengths)} took {self.warmup_seconds}s")
+        if self.state == STATE_LOADED:
+            self.state = STATE_READY
+        return True
+    
+    def _load_model(self, models_dir, precision=None, backend=None):
+        """Load model files from models_dir. Returns True on success."""
         try:
-            # First try to load model info
-            model_info_path = os.path.join(models_dir, 'model_info.pkl')
+            self._open_store(models_dir)
+            self._load_cascade(models_dir)
             
-            if os.path.exists(model_info_path):
-                with open(model_info_path, 'rb') as f:
-                    model_info = pickle.load(f)
+            # First try to load model info (model_info.json, or a legacy model_info.pkl)
+            if manifest_exists(models_dir):
+                model_info = load_model_info(models_dir)
                 
                 # Load model and tokenizer using paths from model_info
                 model_path = model_info['model_path']
@@ -45,76 +203,352 @@ class SentimentAnalyzer:
                 
                 logger.info(f"Loading model from {model_path}")
                 
-                self.model = BertForSequenceClassification.from_pretrained(model_path)
-                self.tokenizer = BertTokenizer.from_pretrained(tokenizer_path)
-                self.model.to(self.device)
-                self.model.eval()
+                self._load_weights(model_path, tokenizer_path, model_info, precision, backend)
                 
                 logger.info(f"Model loaded successfully with metrics: {model_info.get('metrics', 'N/A')}")
                 self.model_loaded = True
                 return True
             else:
                 # Try direct loading if model_info not found
-                logger.warning("model_info.pkl not found, trying direct loading")
+                logger.warning("Model manifest not found, trying direct loading")
                 model_path = os.path.join(models_dir, 'bert_sentiment_model')
                 tokenizer_path = os.path.join(models_dir, 'bert_tokenizer')
                 
                 if os.path.exists(model_path) and os.path.exists(tokenizer_path):
-                    self.model = BertForSequenceClassification.from_pretrained(model_path)
-                    self.tokenizer = BertTokenizer.from_pretrained(tokenizer_path)
-                    self.model.to(self.device)
-                    self.model.eval()
+                    self._load_weights(model_path, tokenizer_path, {}, precision, backend)
                     
                     logger.info("Model loaded successfully via direct loading")
                     self.model_loaded = True
                     return True
                 else:
-                    logger.error(f"Model files not found at {model_path} or {tokenizer_path}")
+                    self.load_error = f"Model files not found at {model_path} or {tokenizer_path}"
+                    logger.error(self.load_error)
                     return False
         except Exception as e:
+            self.load_error = str(e)
             logger.error(f"Error loading model: {str(e)}")
             return False
     
-    def analyze_comment(self, comment, max_length=128):
-        """Analyze a single comment for sentiment."""
-        if not self.model_loaded:
-            logger.warning("Model not loaded, attempting to load...")
-            if not self.load_model():
-                logger.error("Failed to load model, returning neutral")
-                return 'neutral'
+    def _load_weights(self, model_path, tokenizer_path, model_info, precision=None, backend=None):
+        """Load the tokenizer and the inference backend for the model."""
+        tokenizer = load_fast_tokenizer(tokenizer_path)
+        backend = create_backend(model_path, model_info, precision, backend)
+        
+        # Cached predictions are only valid for the model that produced them
+        version = model_info.get('version') or self._fallback_version(model_path)
+        model_version = f"{version}-{backend.name}-{backend.precision}"
+        if getattr(backend, 'early_exit', None) is not None:
+            model_version += f"-exit{backend.early_exit.threshold}"
+        if self.cascade is not None:
+            model_version += f"-cascade{self.cascade.threshold}"
+        
+        # Swap in together so concurrent requests never see a mismatched set
+        self.tokenizer, self.backend, self.model_version = tokenizer, backend, model_version
+        self.early_exit_evaluation = (model_info.get('early_exit') or {}).get('evaluation')
+        self.cache.clear()
+        
+        if self.store is not None:
+            try:
+                self.store.invalidate_other_versions(self.model_version)
+            except Exception as e:
+                logger.warning(f"Could not invalidate stored predictions: {str(e)}")
+    
+    def _connect_remote(self, reload=False):
+        """
+        Check that the inference daemon is reachable and has a model, asking it
+        to reload the model first when reload is set. Returns True on success.
+        """
+        try:
+            status = self.remote.reload() if reload else self.remote.status()
+        except Exception as e:
+            self.load_error = f"Inference daemon unavailable at {self.remote.socket_path}: {str(e)}"
+            logger.error(self.load_error)
+            return False
+        
+        if reload and not status.get('reloaded'):
+            self.load_error = f"Inference daemon could not reload its model: {status.get('error')}"
+            logger.error(self.load_error)
+            return False
+        
+        if status.get('state') not in (STATE_READY, STATE_LOADED):
+            self.load_error = f"Inference daemon model not loaded: {status.get('error')}"
+            logger.error(self.load_error)
+            return False
         
+        self.model_version = status.get('model_version')
+        self.model_loaded = True
+        logger.info(f"Using inference daemon at {self.remote.socket_path} (model {self.model_version})")
+        return True
+    
+    def _open_store(self, models_dir):
+        """Open the persistent prediction store unless it is disabled."""
+        if self.store is not None:
+            return
+        if os.environ.get('SENTIMENT_STORE_ENABLED', 'true').lower() != 'true':
+            return
+        
+        db_path = os.environ.get('SENTIMENT_STORE_PATH') or os.path.join(models_dir, 'prediction_cache.db')
         try:
-            # Tokenize
-            encoding = self.tokenizer(
-                comment,
-                add_special_tokens=True,
-                max_length=max_length,
-                return_token_type_ids=False,
-                padding='max_length',
-                truncation=True,
-                return_attention_mask=True,
-                return_tensors='pt'
+            self.store = PredictionStore(
+                db_path,
+                ttl_seconds=int(os.environ.get('SENTIMENT_STORE_TTL', 7 * 24 * 3600)),
+                max_entries=int(os.environ.get('SENTIMENT_STORE_MAX_ENTRIES', 500000))
             )
+        except Exception as e:
+            logger.warning(f"Persistent prediction store unavailable: {str(e)}")
+    
+    def _load_cascade(self, models_dir):
+        """Load the sparse TF-IDF model used as the first cascade stage, if enabled."""
+        self.cascade = None
+        if not self.cascade_enabled:
+            return
+        
+        model_path = os.environ.get('SENTIMENT_CASCADE_MODEL') or os.path.join(models_dir, 'sentiment_model.pkl')
+        try:
+            # Fail here once rather than on every batch when the NLTK data is missing
+            check_tfidf_resources()
+            self.cascade = CascadeClassifier(
+                model_path,
+                threshold=float(os.environ.get('SENTIMENT_CASCADE_THRESHOLD', 0.8)),
+                audit_rate=float(os.environ.get('SENTIMENT_CASCADE_AUDIT_RATE', 0.05))
+            )
+        except Exception as e:
+            logger.warning(f"Cascade model unavailable, using BERT for every comment: {str(e)}")
+    
+    def _fallback_version(self, model_path):
+        """Derive a model version from the weights location when model_info has none."""
+        try:
+            return f"{os.path.basename(os.path.normpath(model_path))}@{int(os.path.getmtime(model_path))}"
+        except OSError:
+            return 'unversioned'
+    
+    def predict_batch(self, texts, batch_size=None, max_length=128):
+        """
+        Predict sentiment for a list of texts using batched forward passes.
+        
+        Texts are tokenized once without padding, grouped into length buckets
+        under a token budget and each batch is padded only to its longest member.
+        Returns a tuple (labels, probabilities) where labels is a list of
+        sentiment strings and probabilities is a list of {label: probability}
+        dicts, both in the same order as the input texts.
+        
+        Previously seen comments are answered from the in-process LRU cache,
+        then from the persistent store, and duplicates within the batch are
+        sent to the model only once.
+        """
+        texts = [str(text) for text in texts]
+        if not texts:
+            return [], []
+        
+        if not self.ensure_loaded():
+            logger.error("Failed to load model, returning neutral")
+            return ['neutral'] * len(texts), [None] * len(texts)
+        
+        if self.remote is not None:
+            # The daemon caches, deduplicates and batches across all workers
+            try:
+                return self.remote.predict(texts)
+            except Exception as e:
+                logger.error(f"Inference daemon request failed: {str(e)}")
+                return ['neutral'] * len(texts), [None] * len(texts)
+        
+        hashes = [text_hash(text) for text in texts]
+        predictions = {}
+        pending = {}
+        
+        for hashed, text in zip(hashes, texts):
+            if hashed in predictions or hashed in pending:
+                self.deduplicated += 1
+                continue
+            cached = self.cache.get(cache_key(hashed, self.model_version))
+            if cached is not None:
+                predictions[hashed] = cached
+            else:
+                pending[hashed] = text
+        
+        if pending and self.store is not None:
+            try:
+                stored = self.store.get_many(self.model_version, list(pending))
+            except Exception as e:
+                logger.warning(f"Prediction store lookup failed: {str(e)}")
+                stored = {}
+            for hashed, prediction in stored.items():
+                predictions[hashed] = prediction
+                self.cache.put(cache_key(hashed, self.model_version), prediction)
+                del pending[hashed]
+        
+        if pending:
+            pending_hashes = list(pending)
+            labels, probabilities = self._predict_cascade(
+                [pending[hashed] for hashed in pending_hashes], batch_size, max_length
+            )
+            fresh = {}
+            for hashed, label, probs in zip(pending_hashes, labels, probabilities):
+                predictions[hashed] = (label, probs)
+                # Failed predictions fall back to neutral and are not cached
+                if probs is not None:
+                    self.cache.put(cache_key(hashed, self.model_version), (label, probs))
+                    fresh[hashed] = (label, probs)
             
-            # Move to device
-            input_ids = encoding['input_ids'].to(self.device)
-            attention_mask = encoding['attention_mask'].to(self.device)
-            
-            # Get prediction
-            with torch.no_grad():
-                outputs = self.model(input_ids=input_ids, attention_mask=attention_mask)
-                logits = outputs.logits
-                prediction = torch.argmax(logits, dim=1).item()
-            
-            # Map to sentiment label
-            sentiment = self.label_map.get(prediction, 'neutral')
-            return sentiment
-            
+            if fresh and self.store is not None:
+                try:
+                    self.store.put_many(self.model_version, fresh)
+                except Exception as e:
+                    logger.warning(f"Prediction store insert failed: {str(e)}")
+        
+        return [predictions[hashed][0] for hashed in hashes], [predictions[hashed][1] for hashed in hashes]
+    
+    def _predict_cascade(self, texts, batch_size=None, max_length=128):
+        """
+        Answer confident comments with the sparse cascade model and escalate
+        the rest to BERT. Falls through to BERT when the cascade is off.
+        """
+        if self.cascade is None:
+            return self._predict_uncached(texts, batch_size, max_length)
+        
+        try:
+            probs, escalate, audit = self.cascade.route(texts)
         except Exception as e:
-            logger.error(f"Error analyzing comment: {str(e)}")
-            return 'neutral'
+            logger.warning(f"Cascade model failed, using BERT for every comment: {str(e)}")
+            return self._predict_uncached(texts, batch_size, max_length)
+        
+        labels = [self.label_map.get(i, 'neutral') for i in self.cascade.label_ids(probs)]
+        probabilities = [
+            {self.label_map.get(c, str(c)): float(p) for c, p in zip(self.cascade.classes, row)}
+            for row in probs
+        ]
+        cascade_labels = list(labels)
+        
+        # Escalated comments plus a small audit sample of confident ones go to BERT
+        to_bert = sorted(set(escalate) | set(audit))
+        bert_labels = {}
+        if to_bert:
+            results = self._predict_uncached([texts[i] for i in to_bert], batch_size, max_length)
+            for i, label, probs_row in zip(to_bert, *results):
+                if probs_row is not None:
+                    labels[i], probabilities[i] = label, probs_row
+                    bert_labels[i] = label
+        
+        self.cascade.record(
+            cascade_labels, bert_labels,
+            [i for i in escalate if i in bert_labels], [i for i in audit if i in bert_labels], len(texts)
+        )
+        return labels, probabilities
+    
+    def _predict_uncached(self, texts, batch_size=None, max_length=128):
+        """Run the model over texts with length-bucketed batches."""
+        labels = ['neutral'] * len(texts)
+        probabilities = [None] * len(texts)
+        
+        try:
+            # Tokenize everything once, padding is applied per batch below
+            token_ids = encode_batch(self.tokenizer, texts, max_length=max_length)
+        except Exception as e:
+            logger.error(f"Error tokenizing batch: {str(e)}")
+            return labels, probabilities
+        
+        lengths = [len(ids) for ids in token_ids]
+        scheduler = LengthBucketScheduler(
+            max_tokens=self.max_batch_tokens,
+            max_batch_size=batch_size or self.batch_size,
+            max_length=max_length
+        )
+        batches = scheduler.schedule(lengths)
+        self._record_padding_stats(scheduler.padding_stats(lengths, batches))
+        
+        for batch in batches:
+            try:
+                # Pad only to the longest member of this batch
+                input_ids, attention_mask = pad_batch(
+                    [token_ids[i] for i in batch], pad_token_id=self.tokenizer.pad_token_id
+                )
+                
+                # Get predictions for the batch
+                probs = self.backend.predict_proba(input_ids, attention_mask)
+                
+                # Scatter results back into input order
+                for idx, row in zip(batch, probs):
+                    labels[idx] = self.label_map.get(int(row.argmax()), 'neutral')
+                    probabilities[idx] = {
+                        self.label_map.get(i, str(i)): float(p) for i, p in enumerate(row)
+                    }
+                    
+            except Exception as e:
+                logger.error(f"Error analyzing batch: {str(e)}")
+        
+        return labels, probabilities
+    
+    def _record_padding_stats(self, stats):
+        """Accumulate padding statistics for the stats report."""
+        for key in self.padding_totals:
+            self.padding_totals[key] += stats[key]
+        logger.info(
+            f"Scheduled {stats['items']} comments into {stats['batches']} batches, "
+            f"saved {stats['padding_saved_tokens']} padding tokens ({stats['padding_saved_pct']}%)"
+        )
+    
+    def get_stats(self):
+        """Return inference statistics for monitoring endpoints."""
+        if self.remote is not None:
+            return self._remote_stats()
+        totals = dict(self.padding_totals)
+        fixed = totals['fixed_padding_tokens']
+        totals['padding_saved_pct'] = round(100.0 * totals['padding_saved_tokens'] / fixed, 1) if fixed else 0.0
+        return {
+            'state': self.state,
+            'load_seconds': self.load_seconds,
+            'warmup_seconds': self.warmup_seconds,
+            'backend': self.backend.name if self.backend else None,
+            'precision': self.backend.precision if self.backend else None,
+            'mmap_weights': getattr(self.backend, 'mmap', False),
+            'compile': self.backend.compile_stats() if hasattr(self.backend, 'compile_stats') else None,
+            'early_exit': self._early_exit_stats(),
+            'model_version': self.model_version,
+            'padding': totals,
+            'cache': dict(self.cache.stats(), deduplicated=self.deduplicated),
+            'store': self.store.stats() if self.store is not None else None,
+            'microbatch': self.dispatcher.stats() if self.dispatcher is not None else None,
+            'cascade': self.cascade.stats() if self.cascade is not None else None
+        }
+    
+    def _early_exit_stats(self):
+        """Online layer statistics plus the offline accuracy check recorded at training time."""
+        runner = getattr(self.backend, 'early_exit', None)
+        if runner is None:
+            return None
+        stats = runner.stats()
+        evaluation = self.early_exit_evaluation or []
+        stats['offline'] = min(evaluation, key=lambda r: abs(r['threshold'] - runner.threshold), default=None)
+        return stats
+    
+    def _remote_stats(self):
+        """Client counters plus the daemon's own statistics."""
+        try:
+            daemon = self.remote.status()
+        except Exception as e:
+            daemon = {'error': str(e)}
+        return {
+            'state': self.state,
+            'model_version': self.model_version,
+            'remote': self.remote.stats(),
+            'daemon': daemon
+        }
+    
+    def predict(self, texts):
+        """
+        Predict sentiment for texts, coalescing with concurrent callers when
+        micro-batching is enabled. Same return value as predict_batch.
+        """
+        if self.dispatcher is not None:
+            return self.dispatcher.predict(texts)
+        return self.predict_batch(texts)
+    
+    def analyze_comment(self, comment, max_length=128):
+        """Analyze a single comment for sentiment."""
+        labels, _ = self.predict_batch([comment], batch_size=1, max_length=max_length)
+        return labels[0]
     
-    def analyze_comments(self, comments):
+    def analyze_comments(self, comments, batch_size=None):
         """Analyze multiple comments and return results with sentiment distribution."""
         if not comments:
             return [], {'positive': 0, 'negative': 0, 'neutral': 0}
@@ -122,10 +556,13 @@ class SentimentAnalyzer:
         results = []
         sentiment_counts = {'positive': 0, 'negative': 0, 'neutral': 0}
         
-        for comment in comments:
-            sentiment = self.analyze_comment(comment)
+        if batch_size is None:
+            labels, _ = self.predict(comments)
+        else:
+            labels, _ = self.predict_batch(comments, batch_size=batch_size)
+        for comment, sentiment in zip(comments, labels):
             results.append({'comment': comment, 'sentiment': sentiment})
-            sentiment_counts[sentiment] += 1
+            sentiment_counts[sentiment] = sentiment_counts.get(sentiment, 0) + 1
         
         return results, sentiment_counts
 
@@ -0,0 +1,52 @@
+"""
+Model manifest (model_info) read/write helpers.
+The manifest is stored as JSON (model_info.json) next to the safetensors
+weights; legacy model_info.pkl files are still read when no JSON exists.
+"""
+
+import os
+import json
+import pickle
+
+MANIFEST_NAME = 'model_info.json'
+LEGACY_MANIFEST_NAME = 'model_info.pkl'
+
+
+def _to_json(value):
+    """Convert numpy scalars and other non-JSON values written into metrics."""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def manifest_exists(model_dir):
+    """True if either the JSON manifest or a legacy pickle exists."""
+    return (os.path.exists(os.path.join(model_dir, MANIFEST_NAME))
+            or os.path.exists(os.path.join(model_dir, LEGACY_MANIFEST_NAME)))
+
+
+def load_model_info(model_dir):
+    """Load the model manifest, preferring JSON over the legacy pickle."""
+    json_path = os.path.join(model_dir, MANIFEST_NAME)
+    if os.path.exists(json_path):
+        with open(json_path, 'r', encoding='utf-8') as f:
+            model_info = json.load(f)
+        # JSON object keys are strings, label ids are ints
+        if 'labels' in model_info:
+            model_info['labels'] = {int(k): v for k, v in model_info['labels'].items()}
+        if isinstance(model_info.get('teacher'), dict) and 'labels' in model_info['teacher']:
+            model_info['teacher']['labels'] = {int(k): v for k, v in model_info['teacher']['labels'].items()}
+        return model_info
+
+    with open(os.path.join(model_dir, LEGACY_MANIFEST_NAME), 'rb') as f:
+        return pickle.load(f)
+
+
+def save_model_info(model_dir, model_info):
+    """Write the JSON manifest atomically so readers never see a partial file."""
+    json_path = os.path.join(model_dir, MANIFEST_NAME)
+    tmp_path = f"{json_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(model_info, f, indent=2, default=_to_json)
+    os.replace(tmp_path, json_path)
+    return json_path
@@ -0,0 +1,31 @@
+"""
+Reduced-precision inference helpers for CPU serving.
+Supports fp32 (default), int8 dynamic quantization of Linear layers and bf16 autocast.
+"""
+
+import contextlib
+import torch
+
+PRECISION_MODES = ('fp32', 'int8', 'bf16')
+
+
+def quantize_dynamic_int8(model):
+    """Return a copy of the model with its Linear layers dynamically quantized to int8."""
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def inference_context(precision, device_type='cpu'):
+    """Context manager to wrap forward passes for the given precision mode."""
+    if precision == 'bf16':
+        return torch.autocast(device_type=device_type, dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+
+def save_quantized_model(model, path):
+    """Save a quantized model as a whole module so it can be reloaded without re-quantizing."""
+    torch.save(model, path)
+
+
+def load_quantized_model(path):
+    """Load a model saved with save_quantized_model."""
+    return torch.load(path, map_location='cpu', weights_only=False)
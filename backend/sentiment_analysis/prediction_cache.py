@@ -0,0 +1,93 @@
+"""
+In-process LRU cache for sentiment predictions.
+YouTube comment sections repeat a lot ("first", emoji-only comments, copy-paste spam),
+so predictions are cached by a hash of the normalized text and the model version.
+"""
+
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Normalize a comment for cache lookups (the BERT tokenizer is uncased)."""
+    return _WHITESPACE_RE.sub(' ', str(text)).strip().lower()
+
+
+def text_hash(text):
+    """Stable hash of the normalized comment text."""
+    return hashlib.sha1(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def cache_key(hashed, model_version):
+    """Cache key combining the model version and a normalized text hash."""
+    return f"{model_version}:{hashed}"
+
+
+class LRUPredictionCache:
+    """Thread-safe bounded LRU cache with optional time-to-live eviction."""
+
+    def __init__(self, max_size=10000, ttl_seconds=0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, stored_at = entry
+            if self.ttl_seconds and time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries when full."""
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached entries but keep the counters."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
@@ -0,0 +1,174 @@
+"""
+Persistent on-disk store for sentiment predictions.
+Backed by SQLite in WAL mode so it survives restarts and is shared by all
+gunicorn workers on the host. Entries are keyed by (model version, text hash).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Stay below SQLite's default limit on host parameters per statement
+_MAX_PARAMS = 900
+
+
+class PredictionStore:
+    """SQLite-backed prediction store with bulk lookup/insert, TTL and size eviction."""
+
+    def __init__(self, db_path, ttl_seconds=7 * 24 * 3600, max_entries=500000, evict_every=1000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evicted = 0
+        self.invalidated = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS predictions (
+                    model_version TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    label TEXT NOT NULL,
+                    probabilities TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (model_version, text_hash)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_created ON predictions (created_at)")
+
+    def _connection(self):
+        """Return this thread's connection, opening it on first use and again after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        # SQLite connections must not be used across fork (gunicorn preload_app)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_many(self, model_version, hashes):
+        """Look up many text hashes at once. Returns {hash: (label, probabilities)}."""
+        hashes = list(dict.fromkeys(hashes))
+        found = {}
+        if not hashes:
+            return found
+
+        min_created = time.time() - self.ttl_seconds if self.ttl_seconds else 0
+        conn = self._connection()
+        for start in range(0, len(hashes), _MAX_PARAMS):
+            chunk = hashes[start:start + _MAX_PARAMS]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f"SELECT text_hash, label, probabilities FROM predictions "
+                f"WHERE model_version = ? AND created_at >= ? AND text_hash IN ({placeholders})",
+                [model_version, min_created] + chunk
+            ).fetchall()
+            for text_hash, label, probabilities in rows:
+                found[text_hash] = (label, json.loads(probabilities))
+
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, model_version, entries):
+        """Insert many predictions in one transaction. entries is {hash: (label, probabilities)}."""
+        if not entries:
+            return
+
+        now = time.time()
+        rows = [
+            (model_version, text_hash, label, json.dumps(probabilities), now)
+            for text_hash, (label, probabilities) in entries.items()
+        ]
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO predictions "
+                "(model_version, text_hash, label, probabilities, created_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+
+        with self._lock:
+            self.writes += len(rows)
+            self._writes_since_evict += len(rows)
+            should_evict = self._writes_since_evict >= self.evict_every
+            if should_evict:
+                self._writes_since_evict = 0
+
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """Delete expired entries, then the oldest ones beyond max_entries."""
+        removed = 0
+        with self._connection() as conn:
+            if self.ttl_seconds:
+                removed += conn.execute(
+                    "DELETE FROM predictions WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+                ).rowcount
+
+            if self.max_entries:
+                count = conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+                if count > self.max_entries:
+                    removed += self._delete_oldest(conn, count - self.max_entries)
+
+        with self._lock:
+            self.evicted += removed
+        return removed
+
+    def _delete_oldest(self, conn, surplus):
+        """Delete the surplus oldest rows (WITHOUT ROWID tables need the primary key)."""
+        return conn.execute(
+            "DELETE FROM predictions WHERE (model_version, text_hash) IN ("
+            "SELECT model_version, text_hash FROM predictions ORDER BY created_at LIMIT ?)",
+            (surplus,)
+        ).rowcount
+
+    def invalidate_other_versions(self, model_version):
+        """Drop entries produced by any model version other than the current one."""
+        with self._connection() as conn:
+            removed = conn.execute(
+                "DELETE FROM predictions WHERE model_version != ?", (model_version,)
+            ).rowcount
+
+        with self._lock:
+            self.invalidated += removed
+        if removed:
+            logger.info(f"Invalidated {removed} stored predictions from older model versions")
+        return removed
+
+    def stats(self):
+        """Return counters and the current number of stored predictions."""
+        try:
+            rows = self._connection().execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        except sqlite3.Error:
+            rows = None
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'path': self.db_path,
+                'rows': rows,
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'writes': self.writes,
+                'evicted': self.evicted,
+                'invalidated': self.invalidated
+            }
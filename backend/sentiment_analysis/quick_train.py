@@ -12,10 +12,12 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 from sklearn.pipeline import Pipeline
 import joblib
-import re
 import nltk
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
+try:
+    from sentiment_analysis.text_preprocessing import tfidf_preprocess_batch
+except ImportError:
+    # Running as a script from inside sentiment_analysis/
+    from text_preprocessing import tfidf_preprocess_batch
 
 # Create models directory if it doesn't exist
 os.makedirs('models', exist_ok=True)
@@ -171,29 +173,9 @@ def create_sample_data():
 df = create_sample_data()
 print(f"Created dataset with {len(df)} samples")
 
-# Define text preprocessing
-def preprocess_text(text):
-    # Convert to lowercase
-    text = text.lower()
-    
-    # Remove special characters and URLs
-    text = re.sub(r"http\S+|www\S+|https\S+", '', text, flags=re.MULTILINE)
-    text = re.sub(r'\@\w+|\#','', text)
-    text = re.sub(r'[^a-zA-Z\s]', '', text)
-    
-    # Tokenize text
-    tokens = nltk.word_tokenize(text)
-    
-    # Remove stopwords and lemmatize
-    stop_words = set(stopwords.words('english'))
-    lemmatizer = WordNetLemmatizer()
-    tokens = [lemmatizer.lemmatize(token) for token in tokens if token not in stop_words]
-    
-    return ' '.join(tokens)
-
 # Apply preprocessing
 print("Preprocessing text data...")
-df['processed_text'] = df['comment_text'].apply(preprocess_text)
+df['processed_text'] = tfidf_preprocess_batch(df['comment_text'])
 
 # Split data
 print("Splitting data into train and test sets...")
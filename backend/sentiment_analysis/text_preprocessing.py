@@ -0,0 +1,122 @@
+"""
+Shared comment preprocessing for training and serving.
+All patterns are compiled once, ASCII comments are filtered with str.translate
+instead of a regex, lemmatization is memoized, and the batch helpers clean
+each distinct comment only once.
+"""
+
+import re
+from functools import lru_cache
+
+_URL_RE = re.compile(r"http\S+|www\S+|https\S+")
+_MENTION_RE = re.compile(r'\@\w+|\#')
+_HTTP_RE = re.compile(r'http\S+')
+_NON_ALPHA_RE = re.compile(r'[^A-Za-z\s]+')
+_NON_ALNUM_SPACE_RE = re.compile(r'[^A-Za-z0-9 ]+')
+
+# Contractions nltk.word_tokenize splits apart even without an apostrophe
+_CONTRACTIONS_RE = re.compile(r'\b(can)(not)\b|\b(gim|lem)(me)\b|\b(gon|wan)(na)\b|\b(got)(ta)\b')
+
+# ASCII delete tables equivalent to the character-class regexes above
+_ASCII_NON_ALPHA = {i: None for i in range(128) if not (chr(i).isalpha() or chr(i).isspace())}
+_ASCII_NON_ALNUM_SPACE = {i: None for i in range(128) if not (chr(i).isalnum() or chr(i) == ' ')}
+
+_stop_words = None
+_lemmatizer = None
+
+
+def _strip_urls_and_mentions(text):
+    text = _URL_RE.sub('', text)
+    return _MENTION_RE.sub('', text)
+
+
+def clean_text(text, lowercase=True):
+    """
+    Remove URLs, @mentions, hashtags and everything except letters, and
+    collapse whitespace. This is the input format of the BERT models and the
+    cascade's TF-IDF stage.
+    """
+    text = str(text)
+    if lowercase:
+        text = text.lower()
+    text = _strip_urls_and_mentions(text)
+    text = text.translate(_ASCII_NON_ALPHA) if text.isascii() else _NON_ALPHA_RE.sub('', text)
+    return ' '.join(text.split())
+
+
+def clean_basic(text):
+    """Remove URLs and anything but letters, digits and spaces, keeping case (API display format)."""
+    text = _HTTP_RE.sub('', str(text))
+    return text.translate(_ASCII_NON_ALNUM_SPACE) if text.isascii() else _NON_ALNUM_SPACE_RE.sub('', text)
+
+
+@lru_cache(maxsize=200000)
+def lemmatize(token):
+    """WordNet lemma of a token, memoized (comment vocabularies are small and repetitive)."""
+    global _lemmatizer
+    if _lemmatizer is None:
+        from nltk.stem import WordNetLemmatizer
+        _lemmatizer = WordNetLemmatizer()
+    return _lemmatizer.lemmatize(token)
+
+
+def stop_words():
+    """English NLTK stopwords, loaded once."""
+    global _stop_words
+    if _stop_words is None:
+        from nltk.corpus import stopwords
+        _stop_words = frozenset(stopwords.words('english'))
+    return _stop_words
+
+
+def tfidf_preprocess(text):
+    """
+    Preprocessing of the TF-IDF training scripts: clean_text without the
+    whitespace collapse, then stopword removal and lemmatization. After
+    cleaning only letters and whitespace remain, so nltk.word_tokenize reduces
+    to a whitespace split plus its contraction rules.
+    """
+    text = str(text).lower()
+    text = _strip_urls_and_mentions(text)
+    text = text.translate(_ASCII_NON_ALPHA) if text.isascii() else _NON_ALPHA_RE.sub('', text)
+    text = _CONTRACTIONS_RE.sub(lambda m: ' '.join(g for g in m.groups() if g), text)
+    excluded = stop_words()
+    return ' '.join(lemmatize(token) for token in text.split() if token not in excluded)
+
+
+def check_tfidf_resources():
+    """Raise LookupError unless the NLTK data tfidf_preprocess needs (stopwords, wordnet) is installed."""
+    try:
+        stop_words()
+        lemmatize('comments')
+    except LookupError as e:
+        raise LookupError(
+            "TF-IDF preprocessing needs the NLTK stopwords and wordnet data; "
+            "install it with `python -m nltk.downloader stopwords wordnet`"
+        ) from e
+
+
+def _apply_batch(fn, texts):
+    """Apply fn once per distinct text. Returns a Series for a Series input, otherwise a list."""
+    values = texts.tolist() if hasattr(texts, 'tolist') else list(texts)
+    cleaned = {text: fn(text) for text in dict.fromkeys(values)}
+    result = [cleaned[text] for text in values]
+    if hasattr(texts, 'index') and hasattr(texts, 'to_frame'):
+        import pandas as pd
+        return pd.Series(result, index=texts.index, name=texts.name)
+    return result
+
+
+def clean_texts(texts, lowercase=True):
+    """Batch clean_text over a list or pandas Series."""
+    return _apply_batch(lambda text: clean_text(text, lowercase), texts)
+
+
+def clean_basic_batch(texts):
+    """Batch clean_basic over a list or pandas Series."""
+    return _apply_batch(clean_basic, texts)
+
+
+def tfidf_preprocess_batch(texts):
+    """Batch tfidf_preprocess over a list or pandas Series."""
+    return _apply_batch(tfidf_preprocess, texts)
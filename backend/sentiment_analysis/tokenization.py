@@ -0,0 +1,57 @@
+"""
+Batch tokenization pipeline built on the Rust-backed fast BERT tokenizer.
+Whole lists of comments are tokenized in one call and returned as numpy
+arrays, so no per-comment tensors are created.
+"""
+
+import numpy as np
+
+
+def load_fast_tokenizer(path_or_name='bert-base-uncased'):
+    """Load a fast tokenizer (converts a saved slow tokenizer's vocab if needed)."""
+    # Imported here so importing this module does not pull in transformers
+    from transformers import BertTokenizerFast
+
+    return BertTokenizerFast.from_pretrained(path_or_name)
+
+
+def encode_batch(tokenizer, texts, max_length=128):
+    """Tokenize texts in one call without padding. Returns a list of token id lists."""
+    return tokenizer(
+        [str(text) for text in texts],
+        add_special_tokens=True,
+        max_length=max_length,
+        truncation=True,
+        padding=False,
+        return_attention_mask=False,
+        return_token_type_ids=False
+    )['input_ids']
+
+
+def pad_batch(id_lists, pad_token_id=0, length=None):
+    """Pad token id lists into (input_ids, attention_mask) int64 arrays."""
+    length = length or max((len(ids) for ids in id_lists), default=0)
+    input_ids = np.full((len(id_lists), length), pad_token_id, dtype=np.int64)
+    attention_mask = np.zeros((len(id_lists), length), dtype=np.int64)
+
+    for row, ids in enumerate(id_lists):
+        ids = ids[:length]
+        input_ids[row, :len(ids)] = ids
+        attention_mask[row, :len(ids)] = 1
+
+    return input_ids, attention_mask
+
+
+def encode_padded(tokenizer, texts, max_length=128, padding='max_length'):
+    """Tokenize and pad texts in one call. Returns (input_ids, attention_mask) numpy arrays."""
+    encoding = tokenizer(
+        [str(text) for text in texts],
+        add_special_tokens=True,
+        max_length=max_length,
+        truncation=True,
+        padding=padding,
+        return_attention_mask=True,
+        return_token_type_ids=False,
+        return_tensors='np'
+    )
+    return encoding['input_ids'].astype(np.int64), encoding['attention_mask'].astype(np.int64)
@@ -7,9 +7,11 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import accuracy_score, classification_report
 import nltk
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-import re
+try:
+    from sentiment_analysis.text_preprocessing import tfidf_preprocess_batch
+except ImportError:
+    # Running as a script from inside sentiment_analysis/
+    from text_preprocessing import tfidf_preprocess_batch
 
 # Ensure the models directory exists
 os.makedirs('models', exist_ok=True)
@@ -129,28 +131,8 @@ sentiment_map = {
 # Convert sentiment labels to numeric values
 df['label'] = df['sentiment'].map(sentiment_map)
 
-# Text preprocessing function
-def preprocess_text(text):
-    # Convert to lowercase
-    text = text.lower()
-    
-    # Remove special characters, URLs, and numbers
-    text = re.sub(r"http\S+|www\S+|https\S+", '', text, flags=re.MULTILINE)
-    text = re.sub(r'\@\w+|\#','', text)
-    text = re.sub(r'[^a-zA-Z\s]', '', text)
-    
-    # Tokenize text
-    tokens = nltk.word_tokenize(text)
-    
-    # Remove stopwords and lemmatize
-    stop_words = set(stopwords.words('english'))
-    lemmatizer = WordNetLemmatizer()
-    tokens = [lemmatizer.lemmatize(token) for token in tokens if token not in stop_words]
-    
-    return ' '.join(tokens)
-
 # Apply preprocessing
-df['processed_text'] = df['comment_text'].apply(preprocess_text)
+df['processed_text'] = tfidf_preprocess_batch(df['comment_text'])
 
 # Split the data into training and testing sets
 from sklearn.model_selection import train_test_split
@@ -0,0 +1,100 @@
+"""
+Tokenize-once training data pipeline.
+The corpus is tokenized a single time into flat memory-mapped numpy arrays
+(token ids plus per-comment lengths) cached on disk under a key derived from
+the tokenizer and the corpus. Batches are padded only to their longest
+member by the collator, and the sampler groups comments of similar length.
+"""
+
+import os
+import hashlib
+import numpy as np
+import torch
+from transformers import Trainer
+from transformers.trainer_pt_utils import LengthGroupedSampler
+
+try:
+    from sentiment_analysis.tokenization import encode_batch, pad_batch
+except ImportError:
+    # Running as a script from inside sentiment_analysis/
+    from tokenization import encode_batch, pad_batch
+
+
+def corpus_key(tokenizer, texts, max_length):
+    """Cache key covering the tokenizer vocabulary, max_length and every text in order."""
+    digest = hashlib.sha1()
+    digest.update(f"{tokenizer.name_or_path}|{type(tokenizer).__name__}|{len(tokenizer)}|{max_length}".encode('utf-8'))
+    for text in texts:
+        digest.update(str(text).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+
+class TokenizedCorpus:
+    """Token ids for a corpus stored flat in a memory-mapped array, with per-text lengths."""
+
+    def __init__(self, token_ids, lengths):
+        self.token_ids = token_ids
+        self.lengths = lengths
+        self.offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, idx):
+        return self.token_ids[self.offsets[idx]:self.offsets[idx + 1]]
+
+    @classmethod
+    def build(cls, tokenizer, texts, cache_dir, max_length=128, chunk_size=10000):
+        """Load the cached tokenization for texts, tokenizing the corpus first if it is not cached."""
+        key = corpus_key(tokenizer, texts, max_length)
+        ids_path = os.path.join(cache_dir, f"{key}.ids.npy")
+        lengths_path = os.path.join(cache_dir, f"{key}.lengths.npy")
+
+        if not (os.path.exists(ids_path) and os.path.exists(lengths_path)):
+            os.makedirs(cache_dir, exist_ok=True)
+            id_chunks, lengths = [], []
+            for start in range(0, len(texts), chunk_size):
+                for ids in encode_batch(tokenizer, texts[start:start + chunk_size], max_length=max_length):
+                    id_chunks.append(np.asarray(ids, dtype=np.int32))
+                    lengths.append(len(ids))
+            token_ids = np.concatenate(id_chunks) if id_chunks else np.zeros(0, dtype=np.int32)
+
+            # Write under temporary names and rename, so a crash never leaves a partial cache
+            for path, array in ((ids_path, token_ids), (lengths_path, np.asarray(lengths, dtype=np.int32))):
+                tmp_path = f"{path}.tmp.npy"
+                np.save(tmp_path, array)
+                os.replace(tmp_path, path)
+            print(f"Tokenized {len(texts)} texts into {ids_path}")
+
+        return cls(np.load(ids_path, mmap_mode='r'), np.load(lengths_path, mmap_mode='r'))
+
+
+class DynamicPaddingCollator:
+    """Pad each batch to its longest member and build the attention mask."""
+
+    def __init__(self, pad_token_id=0):
+        self.pad_token_id = pad_token_id
+
+    def __call__(self, features):
+        input_ids, attention_mask = pad_batch([f['input_ids'] for f in features], pad_token_id=self.pad_token_id)
+        batch = {
+            'input_ids': torch.from_numpy(input_ids),
+            'attention_mask': torch.from_numpy(attention_mask)
+        }
+        if 'labels' in features[0]:
+            batch['labels'] = torch.tensor([f['labels'] for f in features], dtype=torch.long)
+        return batch
+
+
+class LengthGroupedTrainer(Trainer):
+    """Trainer that groups comments of similar length into batches using the cached lengths."""
+
+    def _get_train_sampler(self):
+        lengths = getattr(self.train_dataset, 'lengths', None)
+        if lengths is None:
+            return super()._get_train_sampler()
+        return LengthGroupedSampler(
+            self.args.train_batch_size * self.args.gradient_accumulation_steps,
+            lengths=[int(length) for length in lengths]
+        )
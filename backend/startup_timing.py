@@ -0,0 +1,83 @@
+"""
+Startup timing report for the Flask API.
+Records how long each import and initialization step takes so slow
+worker starts can be traced to a specific module.
+"""
+
+import sys
+import time
+import importlib
+import threading
+from contextlib import contextmanager
+
+# Imports that dominate startup when they are pulled in eagerly
+HEAVY_MODULES = ['numpy', 'pandas', 'googleapiclient.discovery', 'transformers',
+                 'torch', 'onnxruntime', 'sklearn', 'nltk']
+
+
+class StartupTimer:
+    """Collect named startup steps and their durations."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._steps = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timed(self, name):
+        """Time the enclosed block and record it under name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._steps.append({'step': name, 'ms': round(seconds * 1000.0, 1)})
+
+    def report(self):
+        """Return recorded steps and the elapsed time since the timer was created."""
+        with self._lock:
+            steps = list(self._steps)
+        return {
+            'started_at': self.started_at,
+            'elapsed_ms': round((time.perf_counter() - self._start) * 1000.0, 1),
+            'steps': steps
+        }
+
+
+def profile_imports(modules=None):
+    """
+    Import each module in turn and time it. Modules that are already
+    imported report 0 ms, so run this in a fresh interpreter.
+    """
+    results = []
+    for name in modules or HEAVY_MODULES:
+        already_loaded = name in sys.modules
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            status = 'cached' if already_loaded else 'ok'
+        except ImportError as e:
+            status = f"missing ({e})"
+        results.append({'module': name, 'ms': round((time.perf_counter() - start) * 1000.0, 1), 'status': status})
+    return results
+
+
+startup_timer = StartupTimer()
+
+if __name__ == "__main__":
+    # Fresh interpreter: time the heavy dependencies, then the app itself
+    for row in profile_imports():
+        print(f"{row['module']:<28} {row['ms']:>10.1f} ms  {row['status']}")
+
+    start = time.perf_counter()
+    import app  # noqa: F401
+    print(f"{'app (remaining)':<28} {(time.perf_counter() - start) * 1000.0:>10.1f} ms")
+
+    # This file runs as __main__, so app recorded its steps on the timer of the
+    # separately imported startup_timing module
+    for step in sys.modules['startup_timing'].startup_timer.report()['steps']:
+        print(f"  {step['step']:<26} {step['ms']:>10.1f} ms")
@@ -0,0 +1,333 @@
+"""
+Request-rate limiting and daily quota accounting for the YouTube Data API.
+Every API call path acquires from the shared rate_limiter before sending a
+request: a token bucket caps requests per second, and each endpoint is
+charged its quota cost (search.list costs 100 units, most list calls 1)
+against the daily quota, which YouTube resets at midnight Pacific time.
+The bucket and the quota usage live in a SQLite file in WAL mode, so the
+limits are global: every gunicorn worker, the scrapers and any other
+process on the host that uses the same file share one budget.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+# Quota units per call, see https://developers.google.com/youtube/v3/determine_quota_cost
+QUOTA_COSTS = {
+    'search.list': 100,
+    'videos.list': 1,
+    'channels.list': 1,
+    'commentThreads.list': 1,
+    'comments.list': 1,
+    'playlistItems.list': 1
+}
+DEFAULT_COST = 1
+
+# videos.list accepts at most 50 comma-separated IDs per call
+MAX_IDS_PER_REQUEST = 50
+
+DAILY_QUOTA = int(os.environ.get('YOUTUBE_DAILY_QUOTA', '10000'))
+REQUESTS_PER_SECOND = float(os.environ.get('YOUTUBE_REQUESTS_PER_SECOND', '10'))
+BURST = int(os.environ.get('YOUTUBE_REQUEST_BURST', '10'))
+# 'block' waits for a token, 'reject' raises RateLimited when none is available
+POLICY = os.environ.get('YOUTUBE_RATE_LIMIT_POLICY', 'block')
+MAX_WAIT = float(os.environ.get('YOUTUBE_RATE_LIMIT_MAX_WAIT', '30'))
+
+USAGE_DB_PATH = os.environ.get('YOUTUBE_USAGE_DB') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'api_usage.db'
+)
+# Days of per-endpoint usage kept for inspection
+USAGE_HISTORY_DAYS = 30
+
+QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')
+
+
+class RateLimitError(Exception):
+    """A YouTube API call was not sent because of a local limit."""
+
+
+class RateLimited(RateLimitError):
+    """No request token became available within the allowed wait."""
+
+
+class QuotaExceeded(RateLimitError):
+    """The call would exceed the daily quota."""
+
+
+def quota_cost(endpoint):
+    """Quota units charged for one call to endpoint (e.g. 'search.list')."""
+    return QUOTA_COSTS.get(endpoint, DEFAULT_COST)
+
+
+def estimate_channel_cost(max_videos, resolve_username=False):
+    """
+    Quota units for analyzing a channel's latest max_videos videos: channel
+    details, the video search, batched video lookups and one comments page per
+    video. resolve_username adds the worst-case username lookup (channels.list,
+    then search.list when that finds nothing).
+    """
+    units = (quota_cost('channels.list') + quota_cost('search.list')
+             + -(-max_videos // MAX_IDS_PER_REQUEST) * quota_cost('videos.list')
+             + max_videos * quota_cost('commentThreads.list'))
+    if resolve_username:
+        units += quota_cost('channels.list') + quota_cost('search.list')
+    return units
+
+
+def estimate_trending_cost(max_videos):
+    """Quota units for one page of trending videos plus one comments page for each of max_videos."""
+    return quota_cost('videos.list') + max_videos * quota_cost('commentThreads.list')
+
+
+class UsageStore:
+    """SQLite file in WAL mode holding the shared request bucket and the quota usage per Pacific day."""
+
+    def __init__(self, db_path=USAGE_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _create_schema(self, conn):
+        """Create the tables if needed and drop usage older than USAGE_HISTORY_DAYS."""
+        oldest = (datetime.now(QUOTA_TIMEZONE).date() - timedelta(days=USAGE_HISTORY_DAYS)).isoformat()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS quota_usage (
+                    day TEXT NOT NULL,
+                    endpoint TEXT NOT NULL,
+                    calls INTEGER NOT NULL,
+                    units INTEGER NOT NULL,
+                    PRIMARY KEY (day, endpoint)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS request_buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            """)
+            conn.execute("DELETE FROM quota_usage WHERE day < ?", (oldest,))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _connection(self):
+        """
+        Return this thread's connection, opening it on first use and again
+        after a fork. The file is not created until the store is first used.
+        """
+        conn = getattr(self._local, 'conn', None)
+        # SQLite connections must not be used across fork (gunicorn preload_app)
+        if conn is None or self._local.pid != os.getpid():
+            # Autocommit mode so transaction() controls BEGIN/COMMIT itself
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_schema(conn)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction that holds the database lock from the first read, for check-and-update."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+class TokenBucket:
+    """Token bucket refilled at rate tokens per second up to capacity, shared through a UsageStore."""
+
+    def __init__(self, store, rate, capacity, name='youtube'):
+        self.store = store
+        self.rate = rate
+        self.capacity = capacity
+        self.name = name
+
+    def _take(self):
+        """Take one token if there is one. Returns 0 on success, else the seconds until the next token."""
+        with self.store.transaction() as conn:
+            # Wall-clock time, since the bucket is shared between processes
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated FROM request_buckets WHERE name = ?", (self.name,)).fetchone()
+            tokens, updated = row if row else (float(self.capacity), now)
+            tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+            if tokens < 1:
+                return (1 - tokens) / self.rate
+            conn.execute(
+                "INSERT OR REPLACE INTO request_buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                (self.name, tokens - 1, now)
+            )
+            return 0
+
+    def acquire(self, timeout=None):
+        """Take one token, waiting up to timeout seconds (None waits indefinitely). Returns whether it got one."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._take()
+            if not wait:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class QuotaAccountant:
+    """Daily quota units used per endpoint, kept in a UsageStore under the current Pacific day."""
+
+    def __init__(self, store, daily_quota=DAILY_QUOTA):
+        self.store = store
+        self.daily_quota = daily_quota
+
+    @staticmethod
+    def _current_day():
+        return datetime.now(QUOTA_TIMEZONE).date()
+
+    @staticmethod
+    def _used(conn, day):
+        return conn.execute("SELECT COALESCE(SUM(units), 0) FROM quota_usage WHERE day = ?", (day,)).fetchone()[0]
+
+    def charge(self, endpoint, units=None):
+        """Record one call to endpoint, raising QuotaExceeded if it does not fit in today's quota."""
+        units = quota_cost(endpoint) if units is None else units
+        day = self._current_day().isoformat()
+        with self.store.transaction() as conn:
+            used = self._used(conn, day)
+            if used + units > self.daily_quota:
+                raise QuotaExceeded(
+                    f"{endpoint} needs {units} quota units but only {self.daily_quota - used} are left today"
+                )
+            conn.execute(
+                "INSERT INTO quota_usage (day, endpoint, calls, units) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT (day, endpoint) DO UPDATE SET calls = calls + 1, units = units + excluded.units",
+                (day, endpoint, units)
+            )
+
+    def refund(self, endpoint, units=None):
+        """Undo charge() for a call that was never sent."""
+        units = quota_cost(endpoint) if units is None else units
+        day = self._current_day().isoformat()
+        with self.store.transaction() as conn:
+            conn.execute(
+                "UPDATE quota_usage SET calls = MAX(0, calls - 1), units = MAX(0, units - ?) "
+                "WHERE day = ? AND endpoint = ?",
+                (units, day, endpoint)
+            )
+
+    def remaining(self):
+        conn = self.store._connection()
+        return self.daily_quota - self._used(conn, self._current_day().isoformat())
+
+    def resets_at(self):
+        """Next quota reset as an ISO timestamp."""
+        midnight = datetime.combine(self._current_day() + timedelta(days=1), datetime.min.time(), QUOTA_TIMEZONE)
+        return midnight.isoformat()
+
+    def stats(self):
+        day = self._current_day().isoformat()
+        rows = self.store._connection().execute(
+            "SELECT endpoint, calls, units FROM quota_usage WHERE day = ? ORDER BY endpoint", (day,)
+        ).fetchall()
+        used = sum(units for _, _, units in rows)
+        return {
+            'scope': 'global',
+            'day': day,
+            'daily_quota': self.daily_quota,
+            'used': used,
+            'remaining': self.daily_quota - used,
+            'by_endpoint': {endpoint: {'calls': calls, 'units': units} for endpoint, calls, units in rows}
+        }
+
+
+class ApiRateLimiter:
+    """Token-bucket request rate limit plus daily quota accounting for every API call, shared across processes."""
+
+    def __init__(self, requests_per_second=REQUESTS_PER_SECOND, burst=BURST,
+                 daily_quota=DAILY_QUOTA, policy=POLICY, max_wait=MAX_WAIT, db_path=USAGE_DB_PATH):
+        if policy not in ('block', 'reject'):
+            raise ValueError(f"Unknown rate limit policy: {policy}")
+        self.policy = policy
+        self.max_wait = max_wait
+        self.store = UsageStore(db_path)
+        self.bucket = TokenBucket(self.store, requests_per_second, burst)
+        self.quota = QuotaAccountant(self.store, daily_quota)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+
+    def acquire(self, endpoint):
+        """
+        Admit one call to endpoint: charge its quota cost, then take a request
+        token (waiting up to max_wait under the 'block' policy, not at all under
+        'reject'). Raises QuotaExceeded or RateLimited if the call may not be sent.
+        """
+        self.quota.charge(endpoint)
+        start = time.monotonic()
+        admitted = self.bucket.acquire(timeout=self.max_wait if self.policy == 'block' else 0)
+        waited = time.monotonic() - start
+        with self._lock:
+            self.wait_seconds += waited
+            if admitted:
+                self.requests += 1
+            else:
+                self.rejected += 1
+        if not admitted:
+            # The call was never sent, so give its quota back
+            self.quota.refund(endpoint)
+            logger.warning(f"Rejected {endpoint} call: request rate limit reached")
+            raise RateLimited(f"No request slot for {endpoint} within {self.max_wait if self.policy == 'block' else 0}s")
+
+    def remaining_quota(self):
+        """Quota units left today."""
+        return self.quota.remaining()
+
+    def ensure_quota(self, units):
+        """Raise QuotaExceeded unless at least units quota units are left, e.g. before a large job."""
+        remaining = self.quota.remaining()
+        if units > remaining:
+            raise QuotaExceeded(f"This job needs about {units} quota units but only {remaining} are left today")
+
+    def stats(self):
+        with self._lock:
+            counters = {
+                'policy': self.policy,
+                # The bucket and quota are shared by every process using store
+                'scope': 'global',
+                'store': self.store.db_path,
+                'requests_per_second': self.bucket.rate,
+                'burst': self.bucket.capacity,
+                # Only the calls admitted or rejected in this process
+                'this_process': {
+                    'requests': self.requests,
+                    'rejected': self.rejected,
+                    'wait_seconds': round(self.wait_seconds, 3)
+                }
+            }
+        counters['quota'] = self.quota.stats()
+        counters['quota']['resets_at'] = self.quota.resets_at()
+        return counters
+
+
+# Shared by YouTubeClient and the scrapers
+rate_limiter = ApiRateLimiter()
@@ -0,0 +1,255 @@
+"""
+Retries and circuit breaking for YouTube Data API calls.
+Failed calls are classified as retryable (429, 5xx, rate-limit 403s and
+transport errors) or not. Retryable failures are retried with capped
+exponential backoff and full jitter, honouring Retry-After. When upstream
+keeps failing the circuit breaker opens and calls fail fast until a trial
+call succeeds, so an outage does not burn quota or tie up request threads.
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# 403 reasons that mean "slow down" rather than "not allowed"
+RETRYABLE_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded', 'backendError', 'internalError'}
+
+MAX_ATTEMPTS = int(os.environ.get('YOUTUBE_RETRY_ATTEMPTS', '4'))
+BASE_DELAY = float(os.environ.get('YOUTUBE_RETRY_BASE_DELAY', '0.5'))
+MAX_DELAY = float(os.environ.get('YOUTUBE_RETRY_MAX_DELAY', '20'))
+BREAKER_THRESHOLD = int(os.environ.get('YOUTUBE_BREAKER_THRESHOLD', '5'))
+BREAKER_RESET = float(os.environ.get('YOUTUBE_BREAKER_RESET', '30'))
+
+try:
+    from httplib2 import HttpLib2Error
+    TRANSPORT_ERRORS = (OSError, HttpLib2Error)
+except ImportError:
+    TRANSPORT_ERRORS = (OSError,)
+
+
+class ApiError(Exception):
+    """Non-200 response from the YouTube Data API (used by the requests-based scrapers)."""
+
+    def __init__(self, status, reason=None, retry_after=None, body=''):
+        super().__init__(f"YouTube API returned status {status}" + (f" ({reason})" if reason else ''))
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+        self.body = body
+
+    @classmethod
+    def from_response(cls, response):
+        return cls(response.status_code, _error_reason(response.text),
+                   response.headers.get('Retry-After'), response.text)
+
+
+class UpstreamUnavailable(Exception):
+    """The API kept failing with retryable errors; retry_after is a hint in seconds for the caller."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    """The circuit breaker is open, so the call was not attempted."""
+
+
+def _error_reason(content):
+    """The first error reason of a Google API error body, if it has one."""
+    try:
+        if isinstance(content, bytes):
+            content = content.decode('utf-8', errors='replace')
+        errors = json.loads(content).get('error', {}).get('errors') or [{}]
+        return errors[0].get('reason')
+    except (ValueError, AttributeError):
+        return None
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def error_details(exc):
+    """
+    (status, reason, retry_after) for an upstream failure, status being None
+    for transport errors. Returns None for anything that is not an upstream
+    failure (e.g. a local rate limit), which is never retried.
+    """
+    if isinstance(exc, ApiError):
+        return exc.status, exc.reason, parse_retry_after(exc.retry_after)
+    resp = getattr(exc, 'resp', None)
+    if resp is not None and hasattr(resp, 'status'):
+        # googleapiclient.errors.HttpError
+        return resp.status, _error_reason(getattr(exc, 'content', b'')), parse_retry_after(resp.get('retry-after'))
+    if isinstance(exc, TRANSPORT_ERRORS):
+        return None, type(exc).__name__, None
+    return None
+
+
+def is_retryable(status, reason):
+    if status is None or status in RETRYABLE_STATUSES:
+        return True
+    return status == 403 and reason in RETRYABLE_REASONS
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over consecutive retryable failures."""
+
+    def __init__(self, failure_threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self.short_circuited = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go out now."""
+        with self._lock:
+            if self.state == 'open':
+                remaining = self.opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    self.short_circuited += 1
+                    raise CircuitOpenError(f"YouTube API circuit is open, retry in {remaining:.0f}s", retry_after=remaining)
+                self.state = 'half_open'
+            if self.state == 'half_open':
+                # Only one trial call while half-open
+                if self._trial_in_flight:
+                    self.short_circuited += 1
+                    raise CircuitOpenError("YouTube API circuit is half-open, trial call in progress",
+                                           retry_after=self.reset_timeout)
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                logger.info("YouTube API circuit closed")
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Let another trial call through after one that never reached upstream."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+                logger.warning(f"YouTube API circuit opened after {self.failures} consecutive failures")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'times_opened': self.times_opened,
+                'short_circuited': self.short_circuited
+            }
+
+
+class Resilience:
+    """Retry policy plus circuit breaker shared by every YouTube API call path."""
+
+    def __init__(self, max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY, max_delay=MAX_DELAY, breaker=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self.counters = {
+            'calls': 0,
+            'succeeded_after_retry': 0,
+            'retries': 0,
+            'retryable_failures': 0,
+            'non_retryable_failures': 0,
+            'exhausted': 0
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff for the given (1-based) failed attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def call(self, endpoint, send):
+        """
+        Run send() (one API request) with retries. Non-retryable errors are
+        re-raised unchanged; when retries run out, or Retry-After asks for a
+        longer wait than max_delay, UpstreamUnavailable is raised from the last
+        error. CircuitOpenError is raised without calling send() while the
+        breaker is open.
+        """
+        self._count('calls')
+        for attempt in range(1, self.max_attempts + 1):
+            self.breaker.before_call()
+            try:
+                result = send()
+            except Exception as e:
+                details = error_details(e)
+                if details is None:
+                    # Not an upstream failure (e.g. a local rate limit): no verdict on upstream health
+                    self.breaker.release_trial()
+                    raise
+                status, reason, retry_after = details
+                if not is_retryable(status, reason):
+                    # Upstream answered, it just refused this request
+                    self.breaker.record_success()
+                    self._count('non_retryable_failures')
+                    raise
+
+                self.breaker.record_failure()
+                self._count('retryable_failures')
+                delay = retry_after if retry_after is not None else self.backoff(attempt)
+                if attempt == self.max_attempts or delay > self.max_delay:
+                    self._count('exhausted')
+                    raise UpstreamUnavailable(
+                        f"{endpoint} failed after {attempt} attempt(s): {status or reason}", retry_after=retry_after
+                    ) from e
+
+                self._count('retries')
+                logger.info(f"Retrying {endpoint} in {delay:.2f}s after {status or reason} (attempt {attempt})")
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                if attempt > 1:
+                    self._count('succeeded_after_retry')
+                return result
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        counters['breaker'] = self.breaker.stats()
+        return counters
+
+
+# Shared by YouTubeClient and the scrapers
+resilience = Resilience()
@@ -0,0 +1,29 @@
+"""
+Plain-HTTP access to the YouTube Data API for the requests-based scrapers.
+Every call goes through the shared rate_limiter and resilience layer, the
+same as YouTubeClient.
+"""
+
+import requests
+import certifi
+
+from youtube_api.rate_limit import rate_limiter
+from youtube_api.resilience import resilience, ApiError
+
+REQUEST_TIMEOUT = 30
+
+
+def api_get(url, endpoint):
+    """
+    GET an API URL, retrying retryable failures through the shared resilience
+    layer. Raises ApiError for other non-200 responses and UpstreamUnavailable
+    when retries run out or the circuit is open.
+    """
+    def send():
+        # Every attempt is admitted by the shared rate limiter and charged its quota cost
+        rate_limiter.acquire(endpoint)
+        response = requests.get(url, verify=certifi.where(), timeout=REQUEST_TIMEOUT)
+        if response.status_code != 200:
+            raise ApiError.from_response(response)
+        return response
+    return resilience.call(endpoint, send)
@@ -1,10 +1,128 @@
 import os
+import json
 import time
-import re
-from googleapiclient.discovery import build
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import httplib2
+from googleapiclient.discovery import build_from_document
 from googleapiclient.errors import HttpError
+from sentiment_analysis.text_preprocessing import clean_basic
+from youtube_api.rate_limit import rate_limiter, RateLimitError, MAX_IDS_PER_REQUEST
+from youtube_api.resilience import resilience, UpstreamUnavailable
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_URL = 'https://youtube.googleapis.com/$discovery/rest?version=v3'
+DISCOVERY_CACHE_PATH = os.environ.get(
+    'YOUTUBE_DISCOVERY_CACHE', os.path.join(os.path.dirname(__file__), 'youtube_v3_discovery.json')
+)
+HTTP_TIMEOUT = float(os.environ.get('YOUTUBE_HTTP_TIMEOUT', '30'))
+POOL_SIZE = int(os.environ.get('YOUTUBE_POOL_SIZE', '16'))
+# How many videos' comments are fetched in parallel
+COMMENT_FETCH_WORKERS = int(os.environ.get('YOUTUBE_COMMENT_FETCH_WORKERS', '8'))
+
+_discovery_document = None
+_discovery_source = None
+_discovery_lock = threading.Lock()
+
+
+def load_discovery_document():
+    """
+    Return the parsed YouTube v3 discovery document, loaded once per process.
+
+    Sources in order: the local cache file, the copy bundled with
+    googleapiclient, and finally the discovery endpoint (saved to the cache
+    file so the next process skips the fetch).
+    """
+    global _discovery_document, _discovery_source
+    with _discovery_lock:
+        if _discovery_document is not None:
+            return _discovery_document
+
+        content, source = None, None
+        if os.path.exists(DISCOVERY_CACHE_PATH):
+            with open(DISCOVERY_CACHE_PATH, 'r', encoding='utf-8') as f:
+                content, source = f.read(), 'cache_file'
+        if content is None:
+            try:
+                from googleapiclient.discovery_cache import get_static_doc
+                content, source = get_static_doc('youtube', 'v3'), 'bundled'
+            except ImportError:
+                content = None
+        if content is None:
+            response, body = httplib2.Http(timeout=HTTP_TIMEOUT).request(DISCOVERY_URL)
+            if response.status != 200:
+                raise ValueError(f"Could not fetch the YouTube discovery document: HTTP {response.status}")
+            content, source = body.decode('utf-8'), 'network'
+            try:
+                tmp_path = f"{DISCOVERY_CACHE_PATH}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                os.replace(tmp_path, DISCOVERY_CACHE_PATH)
+            except OSError as e:
+                logger.warning(f"Could not cache the YouTube discovery document: {e}")
+
+        _discovery_document = json.loads(content)
+        _discovery_source = source
+        logger.info(f"Loaded YouTube discovery document from {source}")
+        return _discovery_document
+
+
+class HttpPool:
+    """Keep-alive httplib2 connections shared by all threads, one checked out per API call."""
+
+    def __init__(self, size=POOL_SIZE, timeout=HTTP_TIMEOUT):
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.checkouts = 0
+        self.in_use = 0
+
+    @contextmanager
+    def connection(self):
+        """Check out an idle connection (or open a new one) for the duration of one request."""
+        try:
+            http = self._idle.get_nowait()
+        except queue.Empty:
+            http = httplib2.Http(timeout=self.timeout)
+            with self._lock:
+                self.created += 1
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+        try:
+            yield http
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            try:
+                self._idle.put_nowait(http)
+            except queue.Full:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'connections_created': self.created,
+                'idle': self._idle.qsize(),
+                'in_use': self.in_use,
+                'checkouts': self.checkouts
+            }
+
 
 class YouTubeClient:
+    """
+    YouTube Data API client that is safe to share between threads.
+
+    The service object is built once from the cached discovery document and
+    only used to construct requests; every request executes on a connection
+    checked out of the client's HttpPool.
+    """
+
     def __init__(self):
         api_key = os.getenv('YOUTUBE_DATA_API_KEY')
         if not api_key:
@@ -15,13 +133,31 @@ class YouTubeClient:
             except:
                 raise ValueError("YouTube API key not found. Please set YOUTUBE_DATA_API_KEY environment variable or create scraper/api_key.txt file.")
         
-        self.youtube = build('youtube', 'v3', developerKey=api_key)
+        start = time.perf_counter()
+        self.pool = HttpPool()
+        self.youtube = build_from_document(load_discovery_document(), developerKey=api_key, http=httplib2.Http())
+        self.build_ms = round((time.perf_counter() - start) * 1000.0, 1)
+
+    def _execute(self, request):
+        """
+        Execute a prepared API request on a pooled connection. Each attempt is
+        admitted by the shared rate limiter; retryable failures are retried by
+        the shared resilience layer and raise UpstreamUnavailable when they
+        persist, while other HttpErrors reach the caller unchanged.
+        """
+        # methodId is e.g. 'youtube.search.list'
+        endpoint = request.methodId.split('.', 1)[1]
+
+        def send():
+            rate_limiter.acquire(endpoint)
+            with self.pool.connection() as http:
+                return request.execute(http=http)
+
+        return resilience.call(endpoint, send)
 
     def clean_comment(self, comment):
         # Basic preprocessing to remove URLs and non-alphanumeric characters
-        comment = re.sub(r'http\S+', '', comment)  # Remove URLs
-        comment = re.sub(r'[^A-Za-z0-9 ]+', '', comment)  # Remove non-alphanumeric chars
-        return comment
+        return clean_basic(comment)
 
     def get_channel_id_from_username(self, username):
         """Get channel ID from a username or custom URL."""
@@ -30,7 +166,7 @@ class YouTubeClient:
                 part="id",
                 forUsername=username
             )
-            response = request.execute()
+            response = self._execute(request)
             
             if response['items']:
                 return response['items'][0]['id']
@@ -42,7 +178,7 @@ class YouTubeClient:
                     type="channel",
                     maxResults=1
                 )
-                response = request.execute()
+                response = self._execute(request)
                 
                 if response['items']:
                     return response['items'][0]['snippet']['channelId']
@@ -63,22 +199,19 @@ class YouTubeClient:
                 order="date",
                 type="video"
             )
-            response = request.execute()
+            response = self._execute(request)
+            items = response.get('items', [])
             
-            for item in response.get('items', []):
+            # Statistics for all results in one videos.list call per 50 IDs
+            statistics = self.get_video_statistics([item['id']['videoId'] for item in items])
+            
+            for item in items:
                 video_id = item['id']['videoId']
                 title = item['snippet']['title']
                 description = item['snippet']['description']
                 published_at = item['snippet']['publishedAt']
                 thumbnail = item['snippet']['thumbnails']['high']['url']
-                
-                # Get video statistics
-                video_stats = self.youtube.videos().list(
-                    part="statistics",
-                    id=video_id
-                ).execute()
-                
-                stats = video_stats['items'][0]['statistics'] if video_stats['items'] else {}
+                stats = statistics.get(video_id, {})
                 
                 videos.append({
                     'videoId': video_id,
@@ -91,17 +224,34 @@ class YouTubeClient:
                     'commentCount': int(stats.get('commentCount', 0)) if 'commentCount' in stats else 0
                 })
                 
-                # Sleep a bit to avoid hitting rate limits
-                time.sleep(0.2)
-                
             return videos
         
         except HttpError as e:
             print(f"An HTTP error {e.resp.status} occurred: {e.content}")
             return []
 
+    def get_video_statistics(self, video_ids):
+        """
+        Return {video_id: statistics} for video_ids, fetched with one
+        videos.list call per MAX_IDS_PER_REQUEST IDs. Videos the API does not
+        return (deleted or private) are missing from the result.
+        """
+        video_ids = list(dict.fromkeys(video_ids))
+        statistics = {}
+        for start in range(0, len(video_ids), MAX_IDS_PER_REQUEST):
+            response = self._execute(self.youtube.videos().list(
+                part="statistics",
+                id=','.join(video_ids[start:start + MAX_IDS_PER_REQUEST])
+            ))
+            for item in response.get('items', []):
+                statistics[item['id']] = item.get('statistics', {})
+        return statistics
+
     def get_video_comments(self, video_ids, max_results=100):
-        """Get comments from a list of video IDs."""
+        """
+        Get comments from a list of video IDs. Raises UpstreamUnavailable when
+        the API is down and RateLimitError when a local rate or quota limit is hit.
+        """
         all_comments = []
         
         if isinstance(video_ids, str):
@@ -116,7 +266,7 @@ class YouTubeClient:
                     maxResults=max_results,
                     textFormat='plainText'
                 )
-                response = request.execute()
+                response = self._execute(request)
 
                 while response:
                     for item in response['items']:
@@ -140,8 +290,7 @@ class YouTubeClient:
                             maxResults=max_results,
                             textFormat='plainText'
                         )
-                        time.sleep(0.5)  # Simple backoff strategy
-                        response = request.execute()
+                        response = self._execute(request)
                     else:
                         break
                 
@@ -165,6 +314,14 @@ class YouTubeClient:
                         'comments': [],
                         'error': f"An error occurred: {e.resp.status}"
                     })
+            except UpstreamUnavailable as e:
+                # Retries ran out or the circuit is open: not a per-video error, let callers answer 503
+                logger.warning(f"YouTube API unavailable for video {video_id}: {e}")
+                raise
+            except RateLimitError as e:
+                # Out of quota or request slots: the same for every video, let callers answer 429
+                logger.warning(f"Rate limited fetching comments for video {video_id}: {e}")
+                raise
             except Exception as e:
                 print(f"An error occurred for video {video_id}: {e}")
                 all_comments.append({
@@ -175,6 +332,26 @@ class YouTubeClient:
 
         return all_comments
 
+    def iter_video_comments(self, video_ids, max_results=100, max_workers=None):
+        """
+        Fetch comments for several videos concurrently, yielding
+        (video_id, entry) as each video finishes, where entry is that video's
+        get_video_comments result (including its 'error' on failure).
+        UpstreamUnavailable or RateLimitError from any video is raised to the caller.
+        At most max_workers (default COMMENT_FETCH_WORKERS) videos are in flight.
+        """
+        video_ids = list(video_ids)
+        if not video_ids:
+            return
+        max_workers = max(1, min(max_workers or COMMENT_FETCH_WORKERS, len(video_ids)))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='comment-fetch') as executor:
+            futures = {
+                executor.submit(self.get_video_comments, video_id, max_results): video_id
+                for video_id in video_ids
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()[0]
+
     def get_channel_info(self, channel_id):
         """Get basic information about a channel."""
         try:
@@ -182,7 +359,7 @@ class YouTubeClient:
                 part="snippet,statistics,brandingSettings",
                 id=channel_id
             )
-            response = request.execute()
+            response = self._execute(request)
             
             if not response['items']:
                 return None
@@ -218,7 +395,7 @@ class YouTubeClient:
                 regionCode=region_code,
                 maxResults=max_results
             )
-            response = request.execute()
+            response = self._execute(request)
             
             items = response.get('items', [])
             trending_videos = []
@@ -242,4 +419,50 @@ class YouTubeClient:
         
         except HttpError as e:
             print(f"An HTTP error {e.resp.status} occurred: {e.content}")
-            return []
\ No newline at end of file
+            return []
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+_setup_stats = {'requests': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'last_ms': 0.0}
+
+
+def get_youtube_client():
+    """
+    Return the process-wide YouTubeClient, creating it on first use (and
+    again after a fork, since pooled connections must not cross processes).
+    The time each caller spends here is recorded as its setup time.
+    """
+    global _client, _client_pid
+    start = time.perf_counter()
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = YouTubeClient()
+            _client_pid = os.getpid()
+        client = _client
+        elapsed = (time.perf_counter() - start) * 1000.0
+        _setup_stats['requests'] += 1
+        _setup_stats['total_ms'] += elapsed
+        _setup_stats['max_ms'] = max(_setup_stats['max_ms'], elapsed)
+        _setup_stats['last_ms'] = elapsed
+    return client
+
+
+def youtube_client_stats():
+    """Setup time per request, discovery source and connection pool usage."""
+    with _client_lock:
+        client = _client if _client_pid == os.getpid() else None
+        requests = _setup_stats['requests']
+        stats = {
+            'initialized': client is not None,
+            'discovery_source': _discovery_source,
+            'service_build_ms': client.build_ms if client else None,
+            'setup_requests': requests,
+            'setup_avg_ms': round(_setup_stats['total_ms'] / requests, 3) if requests else None,
+            'setup_max_ms': round(_setup_stats['max_ms'], 3),
+            'setup_last_ms': round(_setup_stats['last_ms'], 3)
+        }
+    if client:
+        stats['pool'] = client.pool.stats()
+    return stats
@@ -2,7 +2,30 @@
 
 # Start Flask API in the background
 cd /app/backend
-gunicorn --bind 0.0.0.0:5000 app:app --daemon
+
+# The image ships no model and /api/ready (the healthcheck) only passes once a BERT
+# model is loaded, so fail fast instead of running unhealthy forever.
+# Mount a trained models directory at /app/backend/sentiment_analysis/models.
+MODELS_DIR=sentiment_analysis/models
+if [ ! -f "$MODELS_DIR/model_info.json" ] && [ ! -f "$MODELS_DIR/model_info.pkl" ] \
+    && [ ! -d "$MODELS_DIR/bert_sentiment_model" ] && [ "$SENTIMENT_ALLOW_NO_MODEL" != "true" ]; then
+    echo "No sentiment model found in /app/backend/$MODELS_DIR." >&2
+    echo "Mount a trained models directory there (see docker-compose.yml), or set SENTIMENT_ALLOW_NO_MODEL=true to start without one." >&2
+    exit 1
+fi
+
+# Optional inference daemon: one process owns the model and batches requests from all workers
+if [ -n "$SENTIMENT_INFERENCE_SOCKET" ]; then
+    python -m sentiment_analysis.inference_daemon --socket "$SENTIMENT_INFERENCE_SOCKET" &
+    # The socket appears once the model is loaded
+    for i in $(seq 1 120); do
+        [ -S "$SENTIMENT_INFERENCE_SOCKET" ] && break
+        sleep 1
+    done
+fi
+
+# Workers, threads and model preloading are configured in gunicorn.conf.py
+gunicorn -c gunicorn.conf.py --daemon
 
 # Start nginx in the foreground (to keep container running)
 nginx -g "daemon off;"
\ No newline at end of file